@@ -41,11 +41,41 @@ class CoordinateExtractor(FeatureExtractor):
         feats['action=%s' % action] = 1.0
         return feats
 
-def closestFood(pos, food, walls):
+def closestFood(pos, food, walls, moves=None):
     """
     closestFood -- this is similar to the function that we have
     worked on in the search project; here its all in one place
+
+    Pass the layout's MoveTable as moves to search its compiled
+    neighbor lists instead of checking the walls at every step.
     """
+    start = moves.cells.get(pos) if moves is not None else None
+    if start is None:
+        return closestFoodByWalls(pos, food, walls)
+    positions, neighbors = moves.positions, moves.neighbors
+    expanded = bytearray(len(positions))
+    expanded[start] = 1
+    fringe = [start]
+    dist = 0
+    while fringe:
+        nextFringe = []
+        for cell in fringe:
+            # if we find a food at this location then exit
+            pos_x, pos_y = positions[cell]
+            if food[pos_x][pos_y]:
+                return dist
+            # otherwise spread out from the location to its neighbours
+            for nbr in neighbors[cell]:
+                if not expanded[nbr]:
+                    expanded[nbr] = 1
+                    nextFringe.append(nbr)
+        fringe = nextFringe
+        dist += 1
+    # no food found
+    return None
+
+def closestFoodByWalls(pos, food, walls):
+    "closestFood, checking the walls grid directly"
     fringe = [(pos[0], pos[1], 0)]
     expanded = set()
     while fringe:
@@ -76,6 +106,7 @@ class SimpleExtractor(FeatureExtractor):
         # extract the grid of food and wall locations and get the ghost locations
         food = state.getFood()
         walls = state.getWalls()
+        moves = state.data.layout.getMoveTable()
         ghosts = state.getGhostPositions()
 
         features = util.Counter()
@@ -88,13 +119,13 @@ class SimpleExtractor(FeatureExtractor):
         next_x, next_y = int(x + dx), int(y + dy)
 
         # count the number of ghosts 1-step away
-        features["#-of-ghosts-1-step-away"] = sum((next_x, next_y) in Actions.getLegalNeighbors(g, walls) for g in ghosts)
+        features["#-of-ghosts-1-step-away"] = sum((next_x, next_y) in moves.getLegalNeighbors(g) for g in ghosts)
 
         # if there is no danger of ghosts then add the food feature
         if not features["#-of-ghosts-1-step-away"] and food[next_x][next_y]:
             features["eats-food"] = 1.0
 
-        dist = closestFood((next_x, next_y), food, walls)
+        dist = closestFood((next_x, next_y), food, walls, moves)
         if dist is not None:
             # make the distance a number less than one otherwise the update
             # will diverge wildly
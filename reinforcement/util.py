@@ -29,6 +29,7 @@
 import sys
 import inspect
 import heapq, random
+import collections
 import cStringIO
 
 
@@ -168,39 +169,77 @@ class Queue:
         "Returns true if the queue is empty"
         return len(self.list) == 0
 
+# Placeholder left in a heap entry whose item has been lazily deleted
+_REMOVED = object()
+
 class PriorityQueue:
     """
       Implements a priority queue data structure. Each inserted item
       has a priority associated with it and the client is usually interested
       in quick retrieval of the lowest-priority item in the queue. This
       data structure allows O(1) access to the lowest-priority item.
+
+      Hashable items are also recorded in an index from item to heap entry,
+      so update() can find them without scanning the heap.  Entries replaced
+      by update() are lazily deleted: they stay in the heap, marked as
+      removed, and are skipped when they reach the top.
     """
     def  __init__(self):
         self.heap = []
         self.count = 0
+        self.index = {}
 
     def push(self, item, priority):
-        entry = (priority, self.count, item)
+        entry = [priority, self.count, item]
         heapq.heappush(self.heap, entry)
         self.count += 1
+        try:
+            self.index[item] = entry
+        except TypeError:
+            pass
 
     def pop(self):
-        (_, _, item) = heapq.heappop(self.heap)
-        return item
+        while True:
+            entry = heapq.heappop(self.heap)
+            item = entry[2]
+            if item is _REMOVED:
+                continue
+            try:
+                if self.index.get(item) is entry:
+                    del self.index[item]
+            except TypeError:
+                pass
+            return item
 
     def isEmpty(self):
+        while self.heap and self.heap[0][2] is _REMOVED:
+            heapq.heappop(self.heap)
         return len(self.heap) == 0
 
     def update(self, item, priority):
         # If item already in priority queue with higher priority, update its priority and rebuild the heap.
         # If item already in priority queue with equal or lower priority, do nothing.
         # If item not in priority queue, do the same thing as self.push.
+        try:
+            entry = self.index.get(item)
+        except TypeError:
+            return self._updateByScan(item, priority)
+        if entry is None:
+            self.push(item, priority)
+        elif priority < entry[0]:
+            entry[2] = _REMOVED
+            newEntry = [priority, entry[1], item]
+            heapq.heappush(self.heap, newEntry)
+            self.index[item] = newEntry
+
+    def _updateByScan(self, item, priority):
+        "Fallback for unhashable items, which cannot be indexed."
         for index, (p, c, i) in enumerate(self.heap):
             if i == item:
                 if p <= priority:
                     break
                 del self.heap[index]
-                self.heap.append((priority, c, item))
+                self.heap.append([priority, c, item])
                 heapq.heapify(self.heap)
                 break
         else:
@@ -222,6 +261,272 @@ class PriorityQueueWithFunction(PriorityQueue):
         "Adds an item to the queue with priority from the priority function"
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
+class IndexedPriorityQueue:
+    """
+      A binary heap of hashable items together with a map from each item to
+      its position in the heap.  Each item is held at most once, so the
+      queue can answer membership and priority queries in O(1) and change an
+      item's priority in O(log n) by sifting its entry in place, instead of
+      scanning or rebuilding the whole heap.
+
+      Items with equal priorities come out first-in, first-out.  An item
+      whose priority is changed counts as freshly inserted for tie-breaking.
+      remove() is lazy: the entry is marked and discarded when it surfaces.
+    """
+    def __init__(self):
+        self.heap = []     # entries [priority, count, item]
+        self.index = {}    # item -> position of its entry in self.heap
+        self.count = 0
+
+    def push(self, item, priority):
+        "Inserts item, or resets its priority if it is already queued"
+        if item in self.index:
+            self._reprioritize(item, priority)
+            return
+        entry = [priority, self.count, item]
+        self.count += 1
+        self.heap.append(entry)
+        self.index[item] = len(self.heap) - 1
+        self._siftUp(len(self.heap) - 1)
+
+    def pop(self):
+        "Removes and returns the item with the lowest priority"
+        return self.popWithPriority()[0]
+
+    def popWithPriority(self):
+        "Removes the lowest-priority item and returns (item, priority)"
+        while True:
+            entry = self._popEntry()
+            if entry[2] is not _REMOVED:
+                del self.index[entry[2]]
+                return entry[2], entry[0]
+
+    def peek(self):
+        "Returns (item, priority) for the lowest-priority item without removing it"
+        while self.heap[0][2] is _REMOVED:
+            self._popEntry()
+        return self.heap[0][2], self.heap[0][0]
+
+    def isEmpty(self):
+        return len(self.index) == 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, item):
+        return item in self.index
+
+    def getPriority(self, item):
+        return self.heap[self.index[item]][0]
+
+    def decreaseKey(self, item, priority):
+        """
+          Lowers the priority of a queued item.  Returns False, and leaves
+          the queue untouched, if the new priority is not an improvement.
+        """
+        if not priority < self.heap[self.index[item]][0]:
+            return False
+        self._reprioritize(item, priority)
+        return True
+
+    def update(self, item, priority):
+        """
+          Same contract as PriorityQueue.update: lowers the priority of a
+          queued item, pushes an item that is not queued, and otherwise does
+          nothing.
+        """
+        if item in self.index:
+            self.decreaseKey(item, priority)
+        else:
+            self.push(item, priority)
+
+    def remove(self, item):
+        "Drops a queued item; its heap entry is discarded when it surfaces"
+        entry = self.heap[self.index.pop(item)]
+        entry[2] = _REMOVED
+
+    def _reprioritize(self, item, priority):
+        pos = self.index[item]
+        entry = self.heap[pos]
+        entry[0] = priority
+        entry[1] = self.count
+        self.count += 1
+        self._siftUp(pos)
+        self._siftDown(self.index[item])
+
+    def _popEntry(self):
+        heap = self.heap
+        last = heap.pop()
+        if not heap:
+            return last
+        top = heap[0]
+        heap[0] = last
+        if last[2] is not _REMOVED:
+            self.index[last[2]] = 0
+        self._siftDown(0)
+        return top
+
+    def _siftUp(self, pos):
+        heap, index = self.heap, self.index
+        entry = heap[pos]
+        while pos > 0:
+            parentPos = (pos - 1) >> 1
+            parent = heap[parentPos]
+            if not entry < parent:
+                break
+            heap[pos] = parent
+            if parent[2] is not _REMOVED:
+                index[parent[2]] = pos
+            pos = parentPos
+        heap[pos] = entry
+        if entry[2] is not _REMOVED:
+            index[entry[2]] = pos
+
+    def _siftDown(self, pos):
+        heap, index = self.heap, self.index
+        size = len(heap)
+        entry = heap[pos]
+        while True:
+            childPos = 2 * pos + 1
+            if childPos >= size:
+                break
+            rightPos = childPos + 1
+            if rightPos < size and heap[rightPos] < heap[childPos]:
+                childPos = rightPos
+            child = heap[childPos]
+            if not child < entry:
+                break
+            heap[pos] = child
+            if child[2] is not _REMOVED:
+                index[child[2]] = pos
+            pos = childPos
+        heap[pos] = entry
+        if entry[2] is not _REMOVED:
+            index[entry[2]] = pos
+
+class BucketHeapQueue:
+    """
+      A priority queue for searches with many equal priorities, as there are
+      when every step cost is a whole number.  Each distinct priority has a
+      FIFO bucket of entries, and a heap holds the priorities that have a
+      bucket, so the heap only grows with the number of distinct priorities
+      and pop goes straight to the lowest one however far apart they are.
+      Push is O(1), or O(log b) when it opens one of b buckets, and pop is
+      O(1) until a bucket empties.
+
+      It has the same interface as IndexedPriorityQueue and pops items in
+      the same order: equal priorities come out first-in, first-out, and an
+      item whose priority is changed counts as freshly inserted.  The first
+      time a priority that is not a whole number is pushed, the queued items
+      move into an IndexedPriorityQueue, which serves all calls from then on.
+    """
+    def __init__(self):
+        self.buckets = {}      # priority -> deque of entries [priority, item]
+        self.priorities = []   # heap of the priorities that have a bucket
+        self.index = {}        # item -> its live entry
+        self.heap = None       # the IndexedPriorityQueue, once one is needed
+
+    def push(self, item, priority):
+        "Inserts item, or resets its priority if it is already queued"
+        if self.heap is None and priority % 1 != 0:
+            self._moveToHeap()
+        if self.heap is not None:
+            self.heap.push(item, priority)
+            return
+        if item in self.index:
+            self.index[item][1] = _REMOVED
+        entry = [priority, item]
+        self.index[item] = entry
+        bucket = self.buckets.get(priority)
+        if bucket is None:
+            bucket = self.buckets[priority] = collections.deque()
+            heapq.heappush(self.priorities, priority)
+        bucket.append(entry)
+
+    def pop(self):
+        "Removes and returns the item with the lowest priority"
+        return self.popWithPriority()[0]
+
+    def popWithPriority(self):
+        "Removes the lowest-priority item and returns (item, priority)"
+        if self.heap is not None:
+            return self.heap.popWithPriority()
+        priority, item = self._front().popleft()
+        del self.index[item]
+        return item, priority
+
+    def peek(self):
+        "Returns (item, priority) for the lowest-priority item without removing it"
+        if self.heap is not None:
+            return self.heap.peek()
+        priority, item = self._front()[0]
+        return item, priority
+
+    def isEmpty(self):
+        return len(self) == 0
+
+    def __len__(self):
+        if self.heap is not None:
+            return len(self.heap)
+        return len(self.index)
+
+    def __contains__(self, item):
+        if self.heap is not None:
+            return item in self.heap
+        return item in self.index
+
+    def getPriority(self, item):
+        if self.heap is not None:
+            return self.heap.getPriority(item)
+        return self.index[item][0]
+
+    def decreaseKey(self, item, priority):
+        """
+          Lowers the priority of a queued item.  Returns False, and leaves
+          the queue untouched, if the new priority is not an improvement.
+        """
+        if not priority < self.getPriority(item):
+            return False
+        self.push(item, priority)
+        return True
+
+    def update(self, item, priority):
+        "Same contract as PriorityQueue.update"
+        if item in self:
+            self.decreaseKey(item, priority)
+        else:
+            self.push(item, priority)
+
+    def remove(self, item):
+        "Drops a queued item; its entry is discarded when its bucket is scanned"
+        if self.heap is not None:
+            self.heap.remove(item)
+            return
+        self.index.pop(item)[1] = _REMOVED
+
+    def _front(self):
+        "Returns the bucket holding the next live entry, discarding removed ones"
+        if not self.index:
+            raise IndexError('pop from an empty queue')
+        buckets, priorities = self.buckets, self.priorities
+        while True:
+            bucket = buckets[priorities[0]]
+            while bucket and bucket[0][1] is _REMOVED:
+                bucket.popleft()
+            if bucket:
+                return bucket
+            del buckets[heapq.heappop(priorities)]
+
+    def _moveToHeap(self):
+        "Queues the live entries, in pop order, on an IndexedPriorityQueue"
+        heap = IndexedPriorityQueue()
+        for priority in sorted(self.buckets):
+            for entry in self.buckets[priority]:
+                if entry[1] is not _REMOVED:
+                    heap.push(entry[1], priority)
+        self.heap = heap
+        self.buckets, self.priorities, self.index = {}, [], {}
+
 
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
@@ -0,0 +1,304 @@
+# benchmark.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Runs the search functions in search.py against every layout in layouts/, the
+puzzles in eightpuzzle.py and a few 15-puzzles, recording expansions, time,
+memory and path cost for each run.  The sliding puzzles are also solved with
+the dedicated pattern database solvers in eightpuzzle.py.  Memory is
+SearchStats.approxBytes: an estimate worked out from the peak frontier and
+closed set sizes, not a measurement of the process, so it tracks changes in
+how many nodes a search keeps rather than changes in how big each one is.
+
+Each search is run --repeats times (3 by default) and the run with the median
+wall time is kept, so one slow run does not count as a regression.
+
+To record a baseline:
+
+> python benchmark.py --output benchmark_baseline.json
+
+To check the current code against it, flagging anything more than 25% worse:
+
+> python benchmark.py --compare benchmark_baseline.json --threshold 0.25
+
+benchmark_baseline.json holds a baseline of the whole suite.  Expansions, path
+costs and memory estimates carry over between machines, but wall times do not:
+record a fresh baseline on your own machine before relying on time
+regressions.
+
+Runs are keyed by 'layout:problem:algorithm', so --layouts and --algorithms
+can be used to time a subset and compare it against a full baseline.
+"""
+
+import json
+import optparse
+import os
+import sys
+import time
+
+import eightpuzzle
+import layout
+import pacman
+import search
+import searchAgents
+import util
+
+# Search functions to run: short name, function in search.py, and the
+# problem types it is run on (None for all of them).  Functions that take a
+# heuristic run once per heuristic listed for the problem type in HEURISTICS.
+ALGORITHMS = [('dfs', 'depthFirstSearch', None),
+              ('bfs', 'breadthFirstSearch', None),
+              ('ucs', 'uniformCostSearch', None),
+              ('astar', 'aStarSearch', None),
+              ('ara', 'anytimeAStarSearch', None),
+              ('bidi', 'bidirectionalSearch', ['position']),
+              ('jps', 'jumpPointSearch', ['position']),
+              ('contracted', 'contractedSearch', ['position', 'corners', 'food']),
+              ('hpa', 'hierarchicalSearch', ['position']),
+              ('idastar', 'iterativeDeepeningAStarSearch', None),
+              ('smastar', 'smaStarSearch', None),
+              ('idastar-tiles', 'idaStarTilePuzzle', ['eightpuzzle', 'fifteenpuzzle']),
+              ('astar-ranked', 'rankedAStarEightPuzzle', ['eightpuzzle'])]
+
+HEURISTICS = {'position': ['manhattanHeuristic', 'euclideanHeuristic', 'landmarkHeuristic'],
+              'corners': ['cornersHeuristic'],
+              'food': ['foodHeuristic'],
+              'eightpuzzle': ['nullHeuristic', 'patternDatabaseHeuristic'],
+              'fifteenpuzzle': ['patternDatabaseHeuristic']}
+
+# Problem types that only some algorithms can solve in reasonable time
+PROBLEM_ALGORITHMS = {'fifteenpuzzle': ['astar', 'idastar', 'idastar-tiles']}
+
+# 15-puzzles scrambled by 30 to 80 random moves, with optimal solutions of
+# 18 to 38 moves
+FIFTEEN_PUZZLE_BOARDS = [(1, 5, 2, 3, 8, 4, 7, 11, 12, 14, 9, 15, 13, 6, 10, 0),
+                         (5, 1, 2, 4, 8, 0, 14, 7, 9, 6, 13, 3, 12, 15, 10, 11),
+                         (1, 3, 7, 11, 5, 2, 6, 15, 4, 12, 10, 13, 8, 0, 9, 14),
+                         (0, 4, 2, 5, 9, 11, 1, 7, 8, 12, 6, 14, 13, 10, 15, 3),
+                         (4, 1, 2, 6, 7, 3, 15, 14, 0, 12, 10, 5, 13, 9, 8, 11)]
+
+# Metrics compared by --compare; a wallTime increase must also exceed
+# --min-time seconds, since differences smaller than that are mostly noise.
+# Expansions, memory and cost do not depend on the machine and are exact.
+METRICS = ['expanded', 'approxBytes', 'cost', 'wallTime']
+
+def readCommand(argv):
+    parser = optparse.OptionParser(description = 'Benchmark the search algorithms in search.py')
+    parser.add_option('--output', '-o', dest = 'output', default = None,
+                      help = 'Write the results as JSON to this file')
+    parser.add_option('--compare', '-c', dest = 'compare', default = None,
+                      help = 'Compare the results against this JSON baseline')
+    parser.add_option('--threshold', dest = 'threshold', type = 'float', default = 0.25,
+                      help = 'Relative increase over the baseline reported as a regression')
+    parser.add_option('--min-time', dest = 'minTime', type = 'float', default = 0.5,
+                      help = 'Ignore time regressions smaller than this many seconds')
+    parser.add_option('--time-limit', dest = 'timeLimit', type = 'int', default = 10,
+                      help = 'Seconds allowed for each run before it is recorded as a timeout')
+    parser.add_option('--repeats', dest = 'repeats', type = 'int', default = 3,
+                      help = 'Runs of each search; the one with the median time is kept')
+    parser.add_option('--layouts', dest = 'layouts', default = None,
+                      help = 'Comma separated layout names to run (default: all)')
+    parser.add_option('--algorithms', dest = 'algorithms', default = None,
+                      help = 'Comma separated algorithm names to run (default: %s)' % ','.join([a[0] for a in ALGORITHMS]))
+    parser.add_option('--no-eightpuzzle', dest = 'eightPuzzle', action = 'store_false', default = True,
+                      help = 'Skip the eight puzzle and 15-puzzle corpus')
+    (options, args) = parser.parse_args(argv)
+    return options
+
+LAYOUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layouts')
+
+def layoutNames():
+    names = [name[:-4] for name in os.listdir(LAYOUT_DIR) if name.endswith('.lay')]
+    names.sort()
+    return names
+
+def layoutProblems(name):
+    """
+    Returns a list of (problemType, makeProblem) pairs for the layout, where
+    makeProblem builds a fresh search problem on each call.
+    """
+    gameState = pacman.GameState()
+    gameState.initialize(layout.getLayout(os.path.join(LAYOUT_DIR, name + '.lay')), 0)
+    problems = []
+    # The position problem's goal is (1, 1); skip it when that is a wall or
+    # where Pacman already stands, since there is nothing to search for.
+    if not gameState.hasWall(1, 1) and gameState.getPacmanPosition() != (1, 1):
+        problems.append(('position', lambda: searchAgents.PositionSearchProblem(gameState, warn=False, visualize=False)))
+    problems.append(('corners', lambda: searchAgents.CornersProblem(gameState)))
+    problems.append(('food', lambda: searchAgents.FoodSearchProblem(gameState)))
+    return problems
+
+def eightPuzzleProblems():
+    problems = []
+    for i in range(len(eightpuzzle.EIGHT_PUZZLE_DATA)):
+        puzzle = eightpuzzle.loadEightPuzzle(i)
+        problems.append(('eightpuzzle%d' % i, lambda puzzle=puzzle: eightpuzzle.EightPuzzleSearchProblem(puzzle)))
+    return problems
+
+def fifteenPuzzleProblems():
+    problems = []
+    for i in range(len(FIFTEEN_PUZZLE_BOARDS)):
+        board = FIFTEEN_PUZZLE_BOARDS[i]
+        problems.append(('fifteenpuzzle%d' % i, lambda board=board: eightpuzzle.TilePuzzleSearchProblem(board)))
+    return problems
+
+def runOne(makeProblem, function, heuristic, timeLimit):
+    "Runs one search and returns its record for the results file"
+    util.mutePrint()
+    try:
+        problem = makeProblem()
+    finally:
+        util.unmutePrint()
+    stats = search.SearchStats()
+    if heuristic is None:
+        call = lambda: function(problem, stats=stats)
+    else:
+        call = lambda: function(problem, heuristic=heuristic, stats=stats)
+    start = time.time()
+    try:
+        path = util.TimeoutFunction(call, timeLimit)()
+    except util.TimeoutFunctionException:
+        record = stats.toDict()
+        record['status'] = 'timeout'
+        record['wallTime'] = time.time() - start
+        return record
+    record = stats.toDict()
+    record['status'] = 'ok'
+    record['cost'] = problem.getCostOfActions(path)
+    return record
+
+def runBenchmarks(options):
+    algorithms = ALGORITHMS
+    if options.algorithms:
+        wanted = options.algorithms.split(',')
+        algorithms = [algorithm for algorithm in ALGORITHMS if algorithm[0] in wanted]
+    names = layoutNames()
+    if options.layouts:
+        names = options.layouts.split(',')
+
+    cases = []
+    for name in names:
+        for problemType, makeProblem in layoutProblems(name):
+            cases.append(('%s:%s' % (name, problemType), problemType, makeProblem))
+    if options.eightPuzzle:
+        for name, makeProblem in eightPuzzleProblems():
+            cases.append(('%s:eightpuzzle' % name, 'eightpuzzle', makeProblem))
+        for name, makeProblem in fifteenPuzzleProblems():
+            cases.append(('%s:fifteenpuzzle' % name, 'fifteenpuzzle', makeProblem))
+
+    runs = {}
+    for prefix, problemType, makeProblem in cases:
+        for name, fn, problemTypes in algorithms:
+            if problemTypes is not None and problemType not in problemTypes:
+                continue
+            if name not in PROBLEM_ALGORITHMS.get(problemType, [name]):
+                continue
+            function = getAlgorithm(fn)
+            if acceptsHeuristic(function):
+                variants = [(name + '-' + h, getHeuristic(h)) for h in HEURISTICS[problemType]]
+            else:
+                variants = [(name, None)]
+            for label, heuristic in variants:
+                key = '%s:%s' % (prefix, label)
+                runs[key] = runMedian(makeProblem, function, heuristic, options.timeLimit, options.repeats)
+                printRun(key, runs[key])
+    return {'timeLimit': options.timeLimit, 'repeats': options.repeats,
+            'python': sys.version.split()[0], 'runs': runs}
+
+def runMedian(makeProblem, function, heuristic, timeLimit, repeats):
+    """
+    Runs one search up to repeats times and returns the record of the run
+    with the median wall time.  A search that times out is not repeated.
+    """
+    records = [runOne(makeProblem, function, heuristic, timeLimit)]
+    while records[0]['status'] == 'ok' and len(records) < repeats:
+        records.append(runOne(makeProblem, function, heuristic, timeLimit))
+    records.sort(key=lambda record: record['wallTime'])
+    return records[len(records) // 2]
+
+def acceptsHeuristic(function):
+    "Returns whether a search function takes a heuristic argument"
+    code = function.func_code
+    return 'heuristic' in code.co_varnames[:code.co_argcount]
+
+def getAlgorithm(name):
+    """
+    Returns the search function called name.  The board solvers in
+    eightpuzzle.py are wrapped to take a search problem like the others.
+    """
+    if hasattr(search, name):
+        return getattr(search, name)
+    solver = getattr(eightpuzzle, name)
+    return lambda problem, stats=None: solver(problem.getStartState(), stats=stats)
+
+def getHeuristic(name):
+    for module in [searchAgents, search, eightpuzzle]:
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise AttributeError('no heuristic named %s' % name)
+
+def printRun(key, record):
+    if record['status'] != 'ok':
+        print '%-60s %s after %.1fs' % (key, record['status'], record['wallTime'])
+    else:
+        print '%-60s expanded %8d  cost %8s  %7.3fs  est. %d KB' % \
+            (key, record['expanded'], record['cost'], record['wallTime'], record['approxBytes'] / 1024)
+    sys.stdout.flush()
+
+def compareResults(baseline, current, threshold, minTime):
+    """
+    Returns a list of messages, one for each run in current that regressed
+    against the same run in baseline.  A timeout only counts when the
+    baseline run, allowing for the threshold, finished within the time limit.
+    """
+    timeLimit = current['timeLimit']
+    regressions = []
+    for key in sorted(current['runs'].keys()):
+        run = current['runs'][key]
+        base = baseline['runs'].get(key)
+        if base is None or base['status'] != 'ok':
+            continue
+        if run['status'] != 'ok':
+            if base['wallTime'] * (1 + threshold) >= timeLimit:
+                continue
+            regressions.append('%s: %s (baseline finished in %.2fs)' % (key, run['status'], base['wallTime']))
+            continue
+        for metric in METRICS:
+            old, new = base.get(metric), run.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == 'wallTime' and new - old < minTime:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append('%s: %s %s -> %s' % (key, metric, old, new))
+    return regressions
+
+if __name__ == '__main__':
+    options = readCommand(sys.argv[1:])
+    results = runBenchmarks(options)
+    if options.output:
+        outputFile = open(options.output, 'w')
+        try: json.dump(results, outputFile, indent=2, sort_keys=True)
+        finally: outputFile.close()
+    if options.compare:
+        baselineFile = open(options.compare)
+        try: baseline = json.load(baselineFile)
+        finally: baselineFile.close()
+        regressions = compareResults(baseline, results, options.threshold, options.minTime)
+        if regressions:
+            print '\n%d regression(s) beyond %d%%:' % (len(regressions), options.threshold * 100)
+            for message in regressions:
+                print '  ' + message
+            sys.exit(1)
+        print '\nNo regressions beyond %d%%.' % (options.threshold * 100)
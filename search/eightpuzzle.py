@@ -14,6 +14,14 @@
 
 import search
 import random
+import collections
+import heapq
+import mmap
+import multiprocessing
+import optparse
+import os
+import sys
+import time
 
 # Module Classes
 
@@ -196,7 +204,7 @@ class EightPuzzleSearchProblem(search.SearchProblem):
         self.puzzle = puzzle
 
     def getStartState(self):
-        return puzzle
+        return self.puzzle
 
     def isGoalState(self,state):
         return state.isGoal()
@@ -262,7 +270,567 @@ def createRandomEightPuzzle(moves=100):
         puzzle = puzzle.result(random.sample(puzzle.legalMoves(), 1)[0])
     return puzzle
 
+# Pattern databases
+
+# Where pattern databases are kept once built
+PDB_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pdbs')
+
+# Disjoint tile partitions for the puzzles of each size.  The goal board
+# has tile t in cell t, with the blank (0) in the top left corner.
+PDB_PATTERNS = {3: [(1, 2, 3, 4), (5, 6, 7, 8)],
+                4: [(1, 2, 3, 6, 7), (4, 5, 8, 9, 12), (10, 11, 13, 14, 15)]}
+
+# Moves of the blank, as (name, row change, column change)
+PUZZLE_MOVES = [('up', -1, 0), ('down', 1, 0), ('left', 0, -1), ('right', 0, 1)]
+
+# Number of set bits in every 16 bit value, for ranking
+BIT_COUNTS = bytearray([bin(i).count('1') for i in range(1 << 16)])
+
+def rankPlacement(positions, cells):
+    """
+      Returns a unique index below cells! / (cells - k)! for a placement of
+      k distinguishable tiles on distinct cells, given as the cell of each.
+    """
+    index = 0
+    used = 0
+    for i in range(len(positions)):
+        p = positions[i]
+        index = index * (cells - i) + p - BIT_COUNTS[used & ((1 << p) - 1)]
+        used |= 1 << p
+    return index
+
+def placements(cells, k):
+    "The number of ways to place k distinguishable tiles on cells cells"
+    count = 1
+    for i in range(k):
+        count *= cells - i
+    return count
+
+def isSolvable(board):
+    """
+      Whether a flat board can reach the goal.  Every move swaps the blank
+      with a tile, so the parity of the board as a permutation must match
+      the parity of the blank's distance from its goal cell.
+
+      >>> isSolvable((1, 0, 2, 3, 4, 5, 6, 7, 8))
+      True
+      >>> isSolvable((0, 2, 1, 3, 4, 5, 6, 7, 8))
+      False
+    """
+    size = int(len(board) ** 0.5)
+    seen = [False] * len(board)
+    swaps = 0
+    for start in range(len(board)):
+        if seen[start]:
+            continue
+        # A cycle of length k takes k - 1 swaps
+        cell = board[start]
+        seen[start] = True
+        while not seen[cell]:
+            seen[cell] = True
+            cell = board[cell]
+            swaps += 1
+    row, col = divmod(list(board).index(0), size)
+    return swaps % 2 == (row + col) % 2
+
+class PatternDatabase:
+    """
+      A pattern database for the size x size sliding puzzle: for every
+      placement of the tiles in pattern, a lower bound on the number of
+      moves of those tiles needed to bring them home.  Moves of other tiles
+      are free, so the databases of a disjoint partition of the tiles can be
+      added together and still never overestimate (Korf and Felner 2002).
+
+      The table holds one byte per placement, indexed by rankPlacement, and
+      is built once by a breadth-first search backwards from the goal.  It
+      is kept on disk and mapped into memory with mmap, so it is only read
+      from disk as it is used and is shared between processes.
+    """
+    def __init__(self, size, pattern, table):
+        self.size = size
+        self.cells = size * size
+        self.pattern = tuple(pattern)
+        self.table = table
+
+    def cost(self, positions):
+        "The lower bound for the pattern's tiles at positions"
+        return ord(self.table[rankPlacement(positions, self.cells)])
+
+    def lookup(self, board):
+        "The lower bound for a board, given as a flat sequence of tiles"
+        return self.cost([list(board).index(tile) for tile in self.pattern])
+
+    def build(size, pattern):
+        "Returns the table for pattern as a bytearray"
+        cells = size * size
+        table = bytearray('\xff') * placements(cells, len(pattern))
+        start = tuple(pattern)
+        table[rankPlacement(start, cells)] = 0
+        frontier = collections.deque([start])
+        while frontier:
+            positions = frontier.popleft()
+            cost = table[rankPlacement(positions, cells)] + 1
+            occupied = set(positions)
+            for i in range(len(positions)):
+                row, col = divmod(positions[i], size)
+                for move, dr, dc in PUZZLE_MOVES:
+                    if 0 <= row + dr < size and 0 <= col + dc < size:
+                        cell = (row + dr) * size + col + dc
+                        if cell in occupied:
+                            continue
+                        nextPositions = positions[:i] + (cell,) + positions[i + 1:]
+                        index = rankPlacement(nextPositions, cells)
+                        if table[index] == 255:
+                            table[index] = cost
+                            frontier.append(nextPositions)
+        return table
+    build = staticmethod(build)
+
+    def filename(size, pattern):
+        return 'pdb-%dx%d-%s.bin' % (size, size, '-'.join([str(tile) for tile in pattern]))
+    filename = staticmethod(filename)
+
+    def load(size, pattern, directory=None):
+        """
+          Maps the database for pattern from directory (PDB_DIRECTORY by
+          default), building and saving it first if it is not there.
+        """
+        if directory is None:
+            directory = PDB_DIRECTORY
+        path = os.path.join(directory, PatternDatabase.filename(size, pattern))
+        if not os.path.exists(path):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            table = PatternDatabase.build(size, pattern)
+            # Write to a temporary name first so that a half-written file
+            # is never picked up by another process
+            tempPath = '%s.%d.tmp' % (path, os.getpid())
+            tempFile = open(tempPath, 'wb')
+            try: tempFile.write(table)
+            finally: tempFile.close()
+            os.rename(tempPath, path)
+        dbFile = open(path, 'rb')
+        try: table = mmap.mmap(dbFile.fileno(), 0, access=mmap.ACCESS_READ)
+        finally: dbFile.close()
+        return PatternDatabase(size, pattern, table)
+    load = staticmethod(load)
+
+_DATABASES = {}
+
+def getPatternDatabases(size=3, directory=None):
+    "Returns the disjoint pattern databases for the size x size puzzle, loading them once"
+    if size not in _DATABASES:
+        _DATABASES[size] = [PatternDatabase.load(size, pattern, directory) for pattern in PDB_PATTERNS[size]]
+    return _DATABASES[size]
+
+def puzzleBoard(state):
+    "The board of an EightPuzzleState or a flat tuple board, as a flat tuple"
+    if isinstance(state, EightPuzzleState):
+        return tuple(state.cells[0] + state.cells[1] + state.cells[2])
+    return tuple(state)
+
+def patternDatabaseHeuristic(state, problem=None):
+    """
+      The disjoint additive pattern database heuristic for an
+      EightPuzzleState, or for a flat tuple board of a square puzzle.
+    """
+    board = puzzleBoard(state)
+    size = int(len(board) ** 0.5)
+    return sum([db.lookup(board) for db in getPatternDatabases(size)])
+
+class TilePuzzleSearchProblem(search.SearchProblem):
+    """
+      The size x size sliding puzzle (the 15-puzzle for size 4) as a search
+      problem over flat tuple boards, with the same moves and goal as
+      EightPuzzleSearchProblem.
+    """
+    def __init__(self, board, size=None):
+        self.board = puzzleBoard(board)
+        self.size = size or int(len(self.board) ** 0.5)
+        self.goal = tuple(range(len(self.board)))
+
+    def getStartState(self):
+        return self.board
+
+    def isGoalState(self, state):
+        return state == self.goal
+
+    def getSuccessors(self, state):
+        size = self.size
+        blank = state.index(0)
+        row, col = divmod(blank, size)
+        successors = []
+        for move, dr, dc in PUZZLE_MOVES:
+            if 0 <= row + dr < size and 0 <= col + dc < size:
+                target = (row + dr) * size + col + dc
+                board = list(state)
+                board[blank], board[target] = board[target], 0
+                successors.append((tuple(board), move, 1))
+        return successors
+
+    def getCostOfActions(self, actions):
+        return len(actions)
+
+def idaStarTilePuzzle(board, databases=None, stats=None):
+    """
+      Solves a sliding puzzle optimally with IDA* and the disjoint pattern
+      databases, returning the list of blank moves.  Moving one tile only
+      changes the database holding that tile, so the heuristic is updated
+      incrementally.  board is an EightPuzzleState or a flat tuple board;
+      None is returned if it cannot be solved.
+    """
+    board = list(puzzleBoard(board))
+    size = int(len(board) ** 0.5)
+    cells = size * size
+    if databases is None:
+        databases = getPatternDatabases(size)
+    if stats is None:
+        stats = search.SearchStats()
+    stats.start('idaStarTilePuzzle')
+    if not isSolvable(board):
+        return stats.finish(None)
+
+    neighbors = []
+    for cell in range(cells):
+        row, col = divmod(cell, size)
+        neighbors.append([(move, (row + dr) * size + col + dc) for move, dr, dc in PUZZLE_MOVES
+                          if 0 <= row + dr < size and 0 <= col + dc < size])
+    owner = {}
+    for d in range(len(databases)):
+        for slot in range(len(databases[d].pattern)):
+            owner[databases[d].pattern[slot]] = (d, slot)
+    positions = [[board.index(tile) for tile in db.pattern] for db in databases]
+    costs = [db.cost(positions[d]) for d, db in zip(range(len(databases)), databases)]
+    tables = [db.table for db in databases]
+    path = []
+    total = [sum(costs)]
+
+    def probe(blank, g, bound, previous):
+        f = g + total[0]
+        if f > bound:
+            return f
+        if total[0] == 0:
+            return True
+        stats.expanded += 1
+        smallest = None
+        for move, target in neighbors[blank]:
+            if target == previous:
+                continue
+            tile = board[target]
+            d, slot = owner[tile]
+            oldCost = costs[d]
+            positions[d][slot] = blank
+            costs[d] = ord(tables[d][rankPlacement(positions[d], cells)])
+            total[0] += costs[d] - oldCost
+            board[blank], board[target] = tile, 0
+            path.append(move)
+            stats.generated += 1
+            result = probe(target, g + 1, bound, blank)
+            if result is True:
+                return True
+            path.pop()
+            board[blank], board[target] = 0, tile
+            positions[d][slot] = target
+            total[0] += oldCost - costs[d]
+            costs[d] = oldCost
+            if smallest is None or result < smallest:
+                smallest = result
+        return smallest
+
+    bound = total[0]
+    while True:
+        result = probe(board.index(0), 0, bound, None)
+        if result is True:
+            return stats.finish(path)
+        if result is None:
+            return stats.finish(None)
+        bound = result
+
+# Batch solving
+
+FACTORIALS = [1]
+for _i in range(1, 17):
+    FACTORIALS.append(FACTORIALS[-1] * _i)
+
+def rankPermutation(board):
+    """
+      The lexicographic rank of a flat board among all permutations of its
+      tiles, from 0 for the goal board up to n! - 1.
+
+      >>> rankPermutation((0, 1, 2, 3, 4, 5, 6, 7, 8))
+      0
+      >>> unrankPermutation(rankPermutation((1, 0, 2, 3, 4, 5, 6, 7, 8)), 9)
+      (1, 0, 2, 3, 4, 5, 6, 7, 8)
+    """
+    n = len(board)
+    rank = 0
+    used = 0
+    for i in range(n):
+        tile = board[i]
+        rank += (tile - BIT_COUNTS[used & ((1 << tile) - 1)]) * FACTORIALS[n - 1 - i]
+        used |= 1 << tile
+    return rank
+
+def unrankPermutation(rank, n):
+    "The flat board of n tiles with the given rankPermutation"
+    remaining = range(n)
+    board = []
+    for i in range(n - 1, -1, -1):
+        digit, rank = divmod(rank, FACTORIALS[i])
+        board.append(remaining.pop(digit))
+    return tuple(board)
+
+def rankAfterMove(rank, board, blank, target):
+    """
+      The rankPermutation of board after the tile at cell target slides
+      into the blank at cell blank, worked out from rank without ranking
+      the new board.  Only the Lehmer digits of the cells from blank to
+      target change, and the digit of the first of them is read off rank.
+
+      >>> board = (3, 1, 2, 0, 4, 5, 6, 7, 8)
+      >>> rankAfterMove(rankPermutation(board), board, 3, 0) == rankPermutation((0, 1, 2, 3, 4, 5, 6, 7, 8))
+      True
+      >>> rankAfterMove(rankPermutation(board), board, 3, 4) == rankPermutation((3, 1, 2, 4, 0, 5, 6, 7, 8))
+      True
+    """
+    n = len(board)
+    tile = board[target]
+    if blank < target:
+        first, last = blank, target
+    else:
+        first, last = target, blank
+    between = 0
+    passed = 0
+    for cell in range(first + 1, last):
+        if board[cell] < tile:
+            between += FACTORIALS[n - 1 - cell]
+            passed += 1
+    if blank < target:
+        # The blank's digit was 0; the tile takes its place with every
+        # smaller tile after it, which now includes the blank
+        after = (rank // FACTORIALS[n - 1 - target]) % (n - target)
+        return rank + (passed + 1 + after) * FACTORIALS[n - 1 - blank] \
+            - after * FACTORIALS[n - 1 - target] + between
+    digit = (rank // FACTORIALS[n - 1 - target]) % (n - target)
+    after = digit - passed - 1
+    return rank - digit * FACTORIALS[n - 1 - target] + after * FACTORIALS[n - 1 - blank] - between
+
+# Per-process tables for rankedAStarEightPuzzle, reused by every puzzle a
+# batch worker solves: (closed, depth, reachedBy) for each number of cells
+_RANKED_TABLES = {}
+
+# Rough size of one rankedAStarEightPuzzle frontier entry for
+# SearchStats.approxBytes: the heap tuple, its board and its estimates
+_RANKED_ENTRY_BYTES = sys.getsizeof((0, 0, 0, (), ())) + sys.getsizeof(tuple(range(9))) + sys.getsizeof((0, 0))
+
+def rankedTables(cells):
+    """
+      The closed, depth and reachedBy bytearrays for boards of cells tiles,
+      allocated on first use.  rankedAStarEightPuzzle puts back every entry
+      it changes, so they are all clear between puzzles.
+    """
+    if cells not in _RANKED_TABLES:
+        count = FACTORIALS[cells]
+        _RANKED_TABLES[cells] = (bytearray(count), bytearray('\xff') * count, bytearray(count))
+    return _RANKED_TABLES[cells]
+
+def rankedAStarEightPuzzle(board, databases=None, stats=None):
+    """
+      Solves an eight puzzle optimally with A* and the pattern database
+      heuristic, returning the list of blank moves, or None if it cannot be
+      solved.  States are permutation ranks; the closed set, the best depth
+      found for each state and the move that reached it are bytearrays
+      indexed by rank, so no per-state objects are kept beyond the frontier.
+      Those take n! bytes each, so only 3x3 boards are accepted;
+      idaStarTilePuzzle solves larger ones.  The tables are allocated once
+      per process and cleared after each puzzle, and a child's rank is
+      worked out from its parent's with rankAfterMove.
+    """
+    board = puzzleBoard(board)
+    checkRankedBoard(board)
+    size = int(len(board) ** 0.5)
+    cells = size * size
+    if databases is None:
+        databases = getPatternDatabases(size)
+    if stats is None:
+        stats = search.SearchStats()
+    stats.start('rankedAStarEightPuzzle')
+    if not isSolvable(board):
+        return stats.finish(None)
+
+    neighbors = []
+    for cell in range(cells):
+        row, col = divmod(cell, size)
+        neighbors.append([(m, (row + dr) * size + col + dc) for m, (move, dr, dc) in enumerate(PUZZLE_MOVES)
+                          if 0 <= row + dr < size and 0 <= col + dc < size])
+    owner = {}
+    for i in range(len(databases)):
+        for tile in databases[i].pattern:
+            owner[tile] = i
+    def estimate(board, db):
+        return ord(db.table[rankPlacement([board.index(tile) for tile in db.pattern], cells)])
+
+    closed, depth, reachedBy = rankedTables(cells)
+    touched = []                        # ranks whose depth has been set
+    start = rankPermutation(board)
+    depth[start] = 0
+    touched.append(start)
+    # Frontier entries carry the board and its estimate from each database
+    estimates = tuple([estimate(board, db) for db in databases])
+    frontier = [(sum(estimates), 0, start, board, estimates)]
+    closedCount = 0
+    try:
+        while frontier:
+            f, g, rank, state, estimates = heapq.heappop(frontier)
+            if closed[rank] or g > depth[rank]:
+                stats.duplicates += 1
+                continue
+            if rank == 0:
+                break
+            closed[rank] = 1
+            closedCount += 1
+            stats.expanded += 1
+            blank = state.index(0)
+            for m, target in neighbors[blank]:
+                childRank = rankAfterMove(rank, state, blank, target)
+                stats.generated += 1
+                if closed[childRank] or g + 1 >= depth[childRank]:
+                    stats.duplicates += 1
+                    continue
+                child = list(state)
+                tile = child[target]
+                child[blank], child[target] = tile, 0
+                child = tuple(child)
+                if depth[childRank] == 255:
+                    touched.append(childRank)
+                depth[childRank] = g + 1
+                reachedBy[childRank] = m
+                # Only the database holding the moved tile changes
+                i = owner[tile]
+                childEstimates = list(estimates)
+                childEstimates[i] = estimate(child, databases[i])
+                heapq.heappush(frontier, (g + 1 + sum(childEstimates), g + 1, childRank, child,
+                                          tuple(childEstimates)))
+            stats.noteSizes(len(frontier), closedCount)
+        else:
+            return stats.finish(None)
+
+        # Walk back from the goal, undoing the move that reached each state
+        path = []
+        rank = 0
+        state = list(unrankPermutation(0, cells))
+        while rank != start:
+            move, dr, dc = PUZZLE_MOVES[reachedBy[rank]]
+            path.append(move)
+            blank = state.index(0)
+            source = blank - dr * size - dc
+            state[blank], state[source] = state[source], 0
+            rank = rankPermutation(state)
+        path.reverse()
+    finally:
+        for rank in touched:
+            closed[rank] = 0
+            depth[rank] = 255
+    stats.finish(path)
+    stats.approxBytes = len(closed) + len(depth) + len(reachedBy) + stats.maxFrontier * _RANKED_ENTRY_BYTES
+    return path
+
+def checkRankedBoard(board):
+    "Raises ValueError unless rankedAStarEightPuzzle can solve the flat board"
+    if len(board) != 9:
+        raise ValueError('rankedAStarEightPuzzle only solves 3x3 boards, not %d tiles; '
+                         'use idaStarTilePuzzle (solver idastar) instead' % len(board))
+
+BATCH_SOLVERS = {'astar': rankedAStarEightPuzzle, 'idastar': idaStarTilePuzzle}
+
+def solveBatchInstance(args):
+    "Solves one (index, board, solverName) job in a worker and returns its record"
+    index, board, solverName = args
+    stats = search.SearchStats()
+    path = BATCH_SOLVERS[solverName](board, stats=stats)
+    return {'index': index, 'board': board, 'path': path,
+            'length': stats.pathLength, 'expanded': stats.expanded,
+            'wallTime': stats.wallTime}
+
+def solveEightPuzzles(puzzles, processes=None, solver='idastar'):
+    """
+      Solves each puzzle (an EightPuzzleState or a flat tuple board) across
+      a pool of processes, by default one per CPU, using the solver named
+      in BATCH_SOLVERS.  Returns one record per puzzle, in order, with its
+      path, length (None if unsolvable), expanded and wallTime.  The
+      default idastar solver takes any square size and is the faster one;
+      astar expands fewer nodes but takes 3x3 boards only.
+
+      >>> solveEightPuzzles([tuple(range(16))], processes=1, solver='astar')
+      Traceback (most recent call last):
+      ...
+      ValueError: rankedAStarEightPuzzle only solves 3x3 boards, not 16 tiles; use idaStarTilePuzzle (solver idastar) instead
+    """
+    jobs = [(i, puzzleBoard(puzzles[i]), solver) for i in range(len(puzzles))]
+    if BATCH_SOLVERS[solver] is rankedAStarEightPuzzle:
+        # Check before building databases or starting workers
+        for i, board, s in jobs:
+            checkRankedBoard(board)
+    # Build any missing databases here rather than in every worker
+    for size in set([int(len(board) ** 0.5) for i, board, s in jobs]):
+        getPatternDatabases(size)
+    if processes == 1 or len(jobs) <= 1:
+        return map(solveBatchInstance, jobs)
+    pool = multiprocessing.Pool(processes)
+    try:
+        chunk = max(1, len(jobs) // (4 * (processes or multiprocessing.cpu_count())))
+        return pool.map(solveBatchInstance, jobs, chunk)
+    finally:
+        pool.close()
+        pool.join()
+
+def readBatchCommand(argv):
+    parser = optparse.OptionParser(description = 'Solve a batch of eight puzzles in parallel')
+    parser.add_option('--puzzles', '-n', dest = 'puzzles', type = 'int', default = 0,
+                      help = 'Number of random puzzles to solve')
+    parser.add_option('--moves', '-m', dest = 'moves', type = 'int', default = 100,
+                      help = 'Random moves used to scramble each puzzle')
+    parser.add_option('--load', '-l', dest = 'load', default = None,
+                      help = 'Comma separated numbers of puzzles from EIGHT_PUZZLE_DATA to solve')
+    parser.add_option('--processes', '-p', dest = 'processes', type = 'int', default = None,
+                      help = 'Worker processes (default: one per CPU)')
+    parser.add_option('--solver', '-s', dest = 'solver', default = 'idastar',
+                      help = 'Solver to use: %s' % ', '.join(sorted(BATCH_SOLVERS.keys())))
+    parser.add_option('--seed', dest = 'seed', type = 'int', default = None,
+                      help = 'Random seed for generating puzzles')
+    parser.add_option('--quiet', '-q', dest = 'quiet', action = 'store_true', default = False,
+                      help = 'Only print the totals')
+    (options, args) = parser.parse_args(argv)
+    if options.solver not in BATCH_SOLVERS:
+        parser.error('unknown solver %s' % options.solver)
+    return options
+
+def runBatch(options):
+    if options.seed is not None:
+        random.seed(options.seed)
+    puzzles = []
+    if options.load:
+        puzzles += [loadEightPuzzle(int(n)) for n in options.load.split(',')]
+    puzzles += [createRandomEightPuzzle(options.moves) for i in range(options.puzzles)]
+
+    start = time.time()
+    results = solveEightPuzzles(puzzles, options.processes, options.solver)
+    elapsed = time.time() - start
+    if not options.quiet:
+        for record in results:
+            print '%5d  %s  length %4s  expanded %7d  %7.4fs' % \
+                (record['index'], ''.join([str(tile) for tile in record['board']]),
+                 record['length'], record['expanded'], record['wallTime'])
+    solved = len([r for r in results if r['path'] is not None])
+    print 'Solved %d of %d puzzles in %.2fs (%.1f puzzles/s), %d nodes expanded' % \
+        (solved, len(results), elapsed, len(results) / max(elapsed, 1e-9),
+         sum([r['expanded'] for r in results]))
+
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        runBatch(readBatchCommand(sys.argv[1:]))
+        sys.exit(0)
+
     puzzle = createRandomEightPuzzle(25)
     print('A random puzzle:')
     print(puzzle)
@@ -0,0 +1,638 @@
+# mazeGraph.py
+# ------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Preprocessed views of a maze's walls that let searches skip over the parts
+of the board where there is nothing to decide.
+
+A MazeGraph contracts every one-cell-wide corridor into a single weighted
+edge between the cells at its ends, which are junctions, dead ends or cells
+the caller asked to keep (a start, a goal, food).  ContractedSearchProblem
+runs any search problem that supports it over that graph.
+
+A ClusterGraph cuts the maze into square clusters and keeps only the
+entrances between them, for hierarchical pathfinding (HPA*) on mazes too
+large to search cell by cell.
+"""
+
+import collections
+
+from game import Directions, Actions
+import search
+import util
+
+_DIRECTIONS = [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]
+
+def wallsKey(walls):
+    """
+    A hashable key identifying a walls Grid by its contents.  The walls of a
+    shared Layout are frozen, so their key is worked out once; other grids
+    are read on every call, so one changed in place gets a new key.
+    """
+    return walls.contentKey()
+
+# Most entries kept in each of the per-maze caches below; food problems ask
+# for a new MazeGraph per food set
+MAZE_GRAPH_CACHE_SIZE = 16
+
+def _cached(cache, key, build):
+    """
+    Returns cache[key], calling build() to fill it in on a miss, and keeps
+    only the MAZE_GRAPH_CACHE_SIZE most recently used entries.
+    """
+    if key in cache:
+        value = cache.pop(key)
+    else:
+        value = build()
+        if len(cache) >= MAZE_GRAPH_CACHE_SIZE:
+            cache.popitem(last=False)
+    cache[key] = value
+    return value
+
+class MazeGraph:
+    """
+    The corridor-contracted graph of a maze.
+
+    The nodes are the open cells that do not have exactly two open
+    neighbours, plus any keyPositions.  edges[node] lists, for each open
+    direction out of node, a tuple (endNode, actions, cells): the node the
+    corridor leads to, the actions that walk it, and the cells entered on
+    the way (ending with endNode).  A corridor that loops back to the node
+    it left without passing another node is dropped, so no node has an
+    edge to itself.
+    """
+
+    def __init__(self, walls, keyPositions=()):
+        self.walls = walls
+        self.keyPositions = frozenset(keyPositions)
+        self.nodes = set()
+        for x in range(walls.width):
+            for y in range(walls.height):
+                if not walls[x][y] and (len(self._exits((x, y))) != 2 or (x, y) in self.keyPositions):
+                    self.nodes.add((x, y))
+        self.edges = {}
+        for node in self.nodes:
+            self.edges[node] = [edge for edge in [self._walk(node, action) for action in self._exits(node)] if edge]
+
+    def _exits(self, position):
+        x, y = position
+        exits = []
+        for action in _DIRECTIONS:
+            dx, dy = Actions.directionToVector(action)
+            nextx, nexty = int(x + dx), int(y + dy)
+            if 0 <= nextx < self.walls.width and 0 <= nexty < self.walls.height and not self.walls[nextx][nexty]:
+                exits.append(action)
+        return exits
+
+    def _walk(self, node, action):
+        "Follows the corridor leaving node by action to the next node, or None if it loops back"
+        actions, cells = [], []
+        position = node
+        while True:
+            dx, dy = Actions.directionToVector(action)
+            position = (int(position[0] + dx), int(position[1] + dy))
+            actions.append(action)
+            cells.append(position)
+            if position == node:
+                return None
+            if position in self.nodes:
+                return (position, tuple(actions), tuple(cells))
+            reverse = Actions.reverseDirection(action)
+            action = [exit for exit in self._exits(position) if exit != reverse][0]
+
+    def numEdges(self):
+        return sum([len(edges) for edges in self.edges.values()]) / 2
+
+_GRAPH_CACHE = collections.OrderedDict()
+
+def getMazeGraph(walls, keyPositions=()):
+    """
+    Returns the MazeGraph for walls and keyPositions, compiling it only once
+    while it stays among the MAZE_GRAPH_CACHE_SIZE most recently used.
+    """
+    return _cached(_GRAPH_CACHE, (wallsKey(walls), frozenset(keyPositions)),
+                   lambda: MazeGraph(walls, keyPositions))
+
+class ContractedSearchProblem(search.SearchProblem):
+    """
+    Wraps a maze search problem so that each step follows a whole corridor
+    of its MazeGraph.  States are the wrapped problem's states, restricted
+    to nodes of the graph; actions are tuples of the wrapped problem's
+    actions, which expandPath joins back into a single list.
+
+    The wrapped problem must have a walls Grid and define:
+
+      getKeyPositions(): the positions where anything other than Pacman's
+        position can change (food, corners, goals), plus the start
+      getStateAt(state, position): the state reached by walking from state
+        to position without passing through any key position
+
+    Step costs come from the wrapped problem's costFn if it has one, and are
+    one per cell otherwise.  Expansions are counted on the wrapped problem.
+    """
+
+    def __init__(self, problem):
+        self.problem = problem
+        self.graph = getMazeGraph(problem.walls, problem.getKeyPositions())
+        self.costFn = getattr(problem, 'costFn', None)
+
+    def getStartState(self):
+        return self.problem.getStartState()
+
+    def isGoalState(self, state):
+        return self.problem.isGoalState(state)
+
+    def getSuccessors(self, state):
+        position = self.positionOf(state)
+        successors = []
+        for endNode, actions, cells in self.graph.edges.get(position, []):
+            if self.costFn is None:
+                cost = len(cells)
+            else:
+                cost = sum([self.costFn(cell) for cell in cells])
+            successors.append((self.problem.getStateAt(state, endNode), actions, cost))
+        self.problem._expanded += 1
+        return successors
+
+    def positionOf(self, state):
+        if isinstance(state[0], tuple):
+            return state[0]
+        return state
+
+    def expandPath(self, path):
+        "Turns a path of corridor actions into the wrapped problem's actions"
+        actions = []
+        for corridor in path:
+            actions.extend(corridor)
+        return actions
+
+    def getCostOfActions(self, actions):
+        return self.problem.getCostOfActions(self.expandPath(actions))
+
+# Runs of open cells along a cluster border at least this long get an
+# entrance at each end rather than a single one in the middle.
+LONG_ENTRANCE = 6
+
+class ClusterGraph:
+    """
+    The abstract graph for hierarchical pathfinding (HPA*, Botea et al. 2004).
+
+    The maze is cut into clusterSize x clusterSize blocks.  Every run of
+    open cells along the border between two blocks gets one entrance in its
+    middle, or one at each end if it is LONG_ENTRANCE cells or longer; each
+    entrance is a pair of facing cells, one on each side.  edges[cell] maps
+    each entrance cell to the cells it can reach directly and the cost: 1
+    across the border, or the maze distance within its own cluster.
+    clusters maps each cluster, as (x // clusterSize, y // clusterSize), to
+    its entrance cells.
+
+    The cell-level path for an edge inside a cluster is only found when a
+    path through it is refined, and is then kept for later searches.
+    """
+
+    def __init__(self, walls, clusterSize=10):
+        self.walls = walls
+        self.clusterSize = clusterSize
+        self.edges = {}
+        self._paths = {}
+        self._findEntrances()
+        self.clusters = {}
+        for cell in self.edges:
+            self.clusters.setdefault(self.clusterOf(cell), []).append(cell)
+        for cells in self.clusters.values():
+            for cell in cells:
+                distances = self.clusterDistances(cell)
+                for other in cells:
+                    if other != cell and other in distances:
+                        self.edges[cell][other] = distances[other]
+
+    def clusterOf(self, cell):
+        return (cell[0] // self.clusterSize, cell[1] // self.clusterSize)
+
+    def _passable(self, x, y):
+        return 0 <= x < self.walls.width and 0 <= y < self.walls.height and not self.walls[x][y]
+
+    def _findEntrances(self):
+        size, width, height = self.clusterSize, self.walls.width, self.walls.height
+        # Borders between columns of clusters, then between rows
+        for border in range(size, width, size):
+            for low in range(0, height, size):
+                self._addEntrances([((border - 1, y), (border, y)) for y in range(low, min(low + size, height))])
+        for border in range(size, height, size):
+            for low in range(0, width, size):
+                self._addEntrances([((x, border - 1), (x, border)) for x in range(low, min(low + size, width))])
+
+    def _addEntrances(self, pairs):
+        "Adds the entrances along one border segment, given its facing cell pairs"
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and self._passable(*pair[0]) and self._passable(*pair[1]):
+                run.append(pair)
+                continue
+            if len(run) >= LONG_ENTRANCE:
+                chosen = [run[0], run[-1]]
+            elif run:
+                chosen = [run[len(run) / 2]]
+            else:
+                chosen = []
+            for inside, outside in chosen:
+                self.edges.setdefault(inside, {})[outside] = 1
+                self.edges.setdefault(outside, {})[inside] = 1
+            run = []
+
+    def clusterDistances(self, source):
+        "Maze distances from source to every cell of its cluster reachable inside it"
+        cluster = self.clusterOf(source)
+        dist = {source: 0}
+        frontier = collections.deque([source])
+        while frontier:
+            x, y = frontier.popleft()
+            for nextPos in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if nextPos not in dist and self._passable(*nextPos) and self.clusterOf(nextPos) == cluster:
+                    dist[nextPos] = dist[(x, y)] + 1
+                    frontier.append(nextPos)
+        return dist
+
+    def clusterPath(self, start, goal):
+        "The actions of a shortest path from start to goal that stays in their cluster"
+        cluster = self.clusterOf(start)
+        parents = {start: None}
+        frontier = collections.deque([start])
+        while frontier:
+            cell = frontier.popleft()
+            if cell == goal:
+                break
+            x, y = cell
+            for action in _DIRECTIONS:
+                dx, dy = Actions.directionToVector(action)
+                nextPos = (int(x + dx), int(y + dy))
+                if nextPos not in parents and self._passable(*nextPos) and self.clusterOf(nextPos) == cluster:
+                    parents[nextPos] = (cell, action)
+                    frontier.append(nextPos)
+        actions = []
+        cell = goal
+        while parents[cell] is not None:
+            cell, action = parents[cell]
+            actions.append(action)
+        actions.reverse()
+        return actions
+
+    def refine(self, start, goal):
+        "The cell-level actions for one step of an abstract path"
+        if self.clusterOf(start) != self.clusterOf(goal):
+            return [Actions.vectorToDirection((goal[0] - start[0], goal[1] - start[1]))]
+        if start in self.edges and goal in self.edges:
+            if (start, goal) not in self._paths:
+                self._paths[(start, goal)] = self.clusterPath(start, goal)
+            return self._paths[(start, goal)]
+        return self.clusterPath(start, goal)
+
+    def findPath(self, start, goal, stats):
+        """
+        Returns the actions of a path from start to goal, or None if the
+        abstract graph connects no path.  Start and goal are linked to the
+        entrances of their clusters for this search only.
+        """
+        startLinks = self.clusterDistances(start)
+        goalLinks = self.clusterDistances(goal)
+        estimate = lambda cell: abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])
+
+        def successors(cell):
+            links = dict(self.edges.get(cell, {}))
+            if cell == start:
+                for other in self.clusters.get(self.clusterOf(start), []):
+                    if other in startLinks:
+                        links[other] = startLinks[other]
+                if goal in startLinks:
+                    links[goal] = startLinks[goal]
+            if cell in goalLinks and self.clusterOf(cell) == self.clusterOf(goal):
+                links[goal] = min(links.get(goal, goalLinks[cell]), goalLinks[cell])
+            return links.items()
+
+        costs = {start: 0}
+        parents = {start: None}
+        closed = {}
+        frontier = util.IndexedPriorityQueue()
+        frontier.push(start, estimate(start))
+        while not frontier.isEmpty():
+            cell = frontier.pop()
+            closed[cell] = True
+            if cell == goal:
+                break
+            stats.expanded += 1
+            for nextCell, cost in successors(cell):
+                newCost = costs[cell] + cost
+                if nextCell in closed or (nextCell in costs and not newCost < costs[nextCell]):
+                    stats.duplicates += 1
+                    continue
+                costs[nextCell] = newCost
+                parents[nextCell] = cell
+                frontier.push(nextCell, newCost + estimate(nextCell))
+                stats.generated += 1
+            stats.noteSizes(len(frontier), len(closed))
+        if goal not in closed:
+            return None
+
+        cells = [goal]
+        while parents[cells[-1]] is not None:
+            cells.append(parents[cells[-1]])
+        cells.reverse()
+        actions = []
+        for i in range(len(cells) - 1):
+            actions.extend(self.refine(cells[i], cells[i + 1]))
+        return actions
+
+_CLUSTER_CACHE = collections.OrderedDict()
+
+def getClusterGraph(walls, clusterSize=10):
+    "Returns the ClusterGraph for walls, building its tables only once per layout"
+    return _cached(_CLUSTER_CACHE, (wallsKey(walls), clusterSize),
+                   lambda: ClusterGraph(walls, clusterSize))
+
+class Landmarks:
+    """
+    Landmark tables for the ALT heuristic (A*, Landmarks, Triangle
+    inequality; Goldberg and Harrelson 2005).
+
+    k landmarks are picked by farthest-point selection: each new landmark is
+    the open cell farthest from all the landmarks chosen so far.  distances
+    holds one list per landmark giving the maze distance to every cell,
+    indexed by x * height + y, with None for cells it cannot reach.  For any
+    landmark L, |d(L,a) - d(L,b)| <= d(a,b), so the largest such difference
+    is a consistent lower bound on the maze distance.
+    """
+
+    def __init__(self, walls, k=8):
+        self.walls = walls
+        self.height = walls.height
+        self.landmarks = []
+        self.distances = []
+        cells = [(x, y) for x in range(walls.width) for y in range(walls.height) if not walls[x][y]]
+        if not cells:
+            return
+        # The first landmark is the cell farthest from an arbitrary one
+        nearest = self._distancesFrom(cells[0])
+        while len(self.landmarks) < k:
+            landmark = max(cells, key=lambda cell: self._gap(nearest, cell))
+            if self._gap(nearest, landmark) == 0:
+                break
+            dist = self._distancesFrom(landmark)
+            if not self.landmarks:
+                nearest = list(dist)
+            for j in range(len(nearest)):
+                if dist[j] is not None and (nearest[j] is None or dist[j] < nearest[j]):
+                    nearest[j] = dist[j]
+            self.landmarks.append(landmark)
+            self.distances.append(dist)
+
+    def _gap(self, nearest, cell):
+        "Distance from cell to the nearest landmark, counting unreachable as farthest"
+        d = nearest[cell[0] * self.height + cell[1]]
+        if d is None:
+            return len(nearest)
+        return d
+
+    def _distancesFrom(self, source):
+        walls, height = self.walls, self.height
+        dist = [None] * (walls.width * height)
+        dist[source[0] * height + source[1]] = 0
+        frontier = collections.deque([source])
+        while frontier:
+            x, y = frontier.popleft()
+            d = dist[x * height + y] + 1
+            for nextx, nexty in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if 0 <= nextx < walls.width and 0 <= nexty < height and not walls[nextx][nexty] \
+                   and dist[nextx * height + nexty] is None:
+                    dist[nextx * height + nexty] = d
+                    frontier.append((nextx, nexty))
+        return dist
+
+    def lowerBound(self, a, b):
+        "A lower bound on the maze distance between positions a and b"
+        ia = a[0] * self.height + a[1]
+        ib = b[0] * self.height + b[1]
+        best = 0
+        for dist in self.distances:
+            da, db = dist[ia], dist[ib]
+            if da is None or db is None:
+                continue
+            if da > db:
+                if da - db > best: best = da - db
+            elif db - da > best:
+                best = db - da
+        return best
+
+_LANDMARK_CACHE = collections.OrderedDict()
+
+def getLandmarks(walls, k=8):
+    "Returns the Landmarks for walls, computing them only once per layout"
+    return _cached(_LANDMARK_CACHE, (wallsKey(walls), k), lambda: Landmarks(walls, k))
+
+# Most BFS trees kept per layout by ShortestPathTrees
+PATH_TREE_CACHE_SIZE = 256
+
+class ShortestPathTrees:
+    """
+    Breadth-first search trees over one maze, kept so that maze distances can
+    be answered without searching again.  trees maps each source to a pair
+    (dist, parents) covering every cell reachable from it, and keeps the most
+    recently used PATH_TREE_CACHE_SIZE sources.
+
+    A distance is known without searching when either end is a source, or
+    when both ends lie on the same branch of a tree: if a is an ancestor of b
+    in the tree from s, the tree's path from a to b is a shortest one.
+    """
+
+    def __init__(self, walls):
+        self.walls = walls
+        self.trees = collections.OrderedDict()
+
+    def addTree(self, source):
+        dist = {source: 0}
+        parents = {source: None}
+        frontier = collections.deque([source])
+        while frontier:
+            x, y = cell = frontier.popleft()
+            for nextPos in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if nextPos not in dist and not self.walls[nextPos[0]][nextPos[1]]:
+                    dist[nextPos] = dist[cell] + 1
+                    parents[nextPos] = cell
+                    frontier.append(nextPos)
+        self.trees[source] = (dist, parents)
+        if len(self.trees) > PATH_TREE_CACHE_SIZE:
+            self.trees.popitem(last=False)
+
+    def getTree(self, source):
+        "Returns (dist, parents) for source, running the search if it is not cached"
+        if source in self.trees:
+            tree = self.trees.pop(source)
+            self.trees[source] = tree
+            return tree
+        self.addTree(source)
+        return self.trees[source]
+
+    def knownDistance(self, a, b):
+        "The maze distance from a to b if a cached tree already holds it, else None"
+        if a == b:
+            return 0
+        if a in self.trees:
+            return self.trees[a][0].get(b)
+        if b in self.trees:
+            return self.trees[b][0].get(a)
+        for dist, parents in self.trees.values():
+            da, db = dist.get(a), dist.get(b)
+            if da is None or db is None or da == db:
+                continue
+            near, far = da < db and (a, b) or (b, a)
+            cell = far
+            for step in range(abs(db - da)):
+                cell = parents[cell]
+            if cell == near:
+                return abs(db - da)
+        return None
+
+    def distances(self, source, targets):
+        """
+        Returns the maze distance from source to each target, or None for
+        targets it cannot reach, using at most one search.
+        """
+        if source not in self.trees:
+            known = [self.knownDistance(source, target) for target in targets]
+            if None not in known:
+                return known
+        dist = self.getTree(source)[0]
+        return [dist.get(target) for target in targets]
+
+_TREE_CACHE = collections.OrderedDict()
+
+def getShortestPathTrees(walls):
+    "Returns the ShortestPathTrees shared by every game on this layout"
+    return _cached(_TREE_CACHE, wallsKey(walls), lambda: ShortestPathTrees(walls))
+
+class NearestGoalField:
+    """
+    Maze distances from cells to their nearest goal, kept between queries
+    and repaired as goals are removed, for agents that repeatedly head for
+    the closest of many goals (such as a ClosestDotSearchAgent eating the
+    closest dot).
+
+    This is a multi-goal LPA* / D* Lite: one Dijkstra search grown
+    backwards from all the goals, so it stays valid wherever the agent
+    moves.  The search is lazy: pathFrom only settles cells until the
+    agent's cell is settled, leaving the rest queued for later queries.
+    dist and parent hold the settled cells (parent[cell] is the next cell
+    towards a goal, or None for a goal); pending holds the queued cells as
+    (distance, parent) pairs.  removeGoal cuts loose only the settled cells
+    whose path led to the goal, and queues them again from their settled
+    neighbours.
+    """
+
+    def __init__(self, walls, goals):
+        self.walls = walls
+        self.goals = set(goals)
+        self.dist = {}
+        self.parent = {}
+        self.pending = {}
+        self.queue = util.BucketHeapQueue()
+        self.expanded = 0
+        self._neighborCache = {}
+        for goal in self.goals:
+            self.pending[goal] = (0, None)
+            self.queue.push(goal, 0)
+
+    def _neighbors(self, cell):
+        neighbors = self._neighborCache.get(cell)
+        if neighbors is None:
+            x, y = cell
+            walls = self.walls
+            neighbors = self._neighborCache[cell] = \
+                [(nextx, nexty) for nextx, nexty in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y))
+                 if 0 <= nextx < walls.width and 0 <= nexty < walls.height and not walls[nextx][nexty]]
+        return neighbors
+
+    def _settle(self, target):
+        "Settles queued cells in order of distance until target is settled or none are left"
+        dist, pending, queue = self.dist, self.pending, self.queue
+        while target not in dist and not queue.isEmpty():
+            cell, d = queue.popWithPriority()
+            self.parent[cell] = pending.pop(cell)[1]
+            dist[cell] = d
+            self.expanded += 1
+            for nextPos in self._neighbors(cell):
+                if nextPos not in dist and (nextPos not in pending or d + 1 < pending[nextPos][0]):
+                    pending[nextPos] = (d + 1, cell)
+                    queue.push(nextPos, d + 1)
+
+    def removeGoal(self, goal):
+        if goal not in self.goals:
+            return
+        self.goals.remove(goal)
+        dist, parent, pending = self.dist, self.parent, self.pending
+        # Cut out the settled cells whose shortest path leads to goal
+        cut = []
+        if goal in dist:
+            cut.append(goal)
+            for cell in cut:
+                for nextPos in self._neighbors(cell):
+                    if parent.get(nextPos) == cell:
+                        cut.append(nextPos)
+            for cell in cut:
+                del dist[cell]
+                del parent[cell]
+        # Queued cells only ever point at settled cells, so the ones to
+        # redo are the cut, the goal and any queued neighbours of the cut
+        stale = cut[:]
+        if goal in pending:
+            stale.append(goal)
+        for cell in cut:
+            for nextPos in self._neighbors(cell):
+                if nextPos in pending and pending[nextPos][1] == cell:
+                    stale.append(nextPos)
+        for cell in stale:
+            best = None
+            for nextPos in self._neighbors(cell):
+                if nextPos in dist and (best is None or dist[nextPos] + 1 < best[0]):
+                    best = (dist[nextPos] + 1, nextPos)
+            if best is not None:
+                pending[cell] = best
+                self.queue.push(cell, best[0])
+            elif cell in pending:
+                del pending[cell]
+                self.queue.remove(cell)
+
+    def distanceFrom(self, start):
+        "The maze distance from start to its nearest goal, or None if none is reachable"
+        self._settle(start)
+        return self.dist.get(start)
+
+    def goalFrom(self, start):
+        "The goal that pathFrom(start) leads to, or None if none is reachable"
+        if self.distanceFrom(start) is None:
+            return None
+        cell = start
+        while self.parent[cell] is not None:
+            cell = self.parent[cell]
+        return cell
+
+    def pathFrom(self, start):
+        "The actions of a shortest path from start to its nearest goal, or None if none is reachable"
+        if self.distanceFrom(start) is None:
+            return None
+        actions = []
+        cell = start
+        while self.parent[cell] is not None:
+            nextPos = self.parent[cell]
+            actions.append(Actions.vectorToDirection((nextPos[0] - cell[0], nextPos[1] - cell[1])))
+            cell = nextPos
+        return actions
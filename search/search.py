@@ -18,6 +18,9 @@ Pacman agents (in searchAgents.py).
 """
 
 import util
+import json
+import sys
+import time
 
 class SearchProblem:
     """
@@ -25,6 +28,10 @@ class SearchProblem:
     any of the methods (in object-oriented terminology: an abstract class).
 
     You do not need to change anything in this class, ever.
+
+    Problems with a single goal state can also define getGoalState() and
+    getPredecessors(state), the reverse of getSuccessors, to support
+    bidirectionalSearch.
     """
 
     def getStartState(self):
@@ -73,114 +80,211 @@ def tinyMazeSearch(problem):
     return  [s, s, w, s, w, w, s, w]
 
 
-class Node():
-    def __init__(self, position, totalPath, totalCost):
+class Node(object):
+    """
+    A search node: a state, the cost of the path that reached it and a
+    pointer to the node it was generated from.  Nodes share their common
+    prefixes through the parent pointers, so the list of actions is only
+    built, by walking back to the root, when getPath() is called.
+    """
+    __slots__ = ('pos', 'parent', 'action', 'cost')
+
+    def __init__(self, position, parent=None, action=None, totalCost=0):
         self.pos = position
+        self.parent = parent
+        self.action = action
         self.cost = totalCost
-        self.path = totalPath
     def getPos(self):
         return self.pos
     def getPath(self):
-        return self.path
+        path = []
+        node = self
+        while node.parent is not None:
+            path.append(node.action)
+            node = node.parent
+        path.reverse()
+        return path
     def getCost(self):
         return self.cost
+    def child(self, position, action, stepCost):
+        return Node(position, self, action, self.cost + stepCost)
+
+
+class SearchStats:
+    """
+    Counters and timings for one run of a search function.  Pass an instance
+    as the stats argument of any search below to have it filled in; when no
+    instance is passed the search keeps its counts in a throwaway one and
+    does not time the heuristic.
+
+      expanded:         states whose successors were generated
+      generated:        successor nodes created
+      duplicates:       successors dropped, or stale nodes popped, because
+                        their state was already closed or queued more cheaply
+      maxFrontier:      largest number of queued nodes at any time
+      maxClosed:        largest number of closed states at any time
+      approxBytes:      rough size of the frontier and closed set at their peak
+      wallTime/cpuTime: seconds spent in the search
+      heuristicCalls/heuristicTime: calls to the heuristic and seconds spent there
+      suboptimalityBound: for anytime searches, the factor by which the
+                        returned path may exceed the optimal cost
+    """
+    FIELDS = ['algorithm', 'expanded', 'generated', 'duplicates', 'maxFrontier',
+              'maxClosed', 'approxBytes', 'wallTime', 'cpuTime',
+              'heuristicCalls', 'heuristicTime', 'pathLength', 'suboptimalityBound']
+
+    def __init__(self):
+        self.algorithm = None
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.maxFrontier = 0
+        self.maxClosed = 0
+        self.approxBytes = 0
+        self.wallTime = 0.0
+        self.cpuTime = 0.0
+        self.heuristicCalls = 0
+        self.heuristicTime = 0.0
+        self.pathLength = None
+        self.suboptimalityBound = None
+
+    def start(self, algorithm):
+        self.algorithm = algorithm
+        self._wallStart = time.time()
+        self._cpuStart = time.clock()
+
+    def finish(self, path):
+        "Stops the clocks and returns path, so searches can `return stats.finish(path)`"
+        self.wallTime += time.time() - self._wallStart
+        self.cpuTime += time.clock() - self._cpuStart
+        self.approxBytes = self.maxFrontier * _FRONTIER_ENTRY_BYTES + self.maxClosed * _CLOSED_ENTRY_BYTES
+        if isinstance(path, list):
+            self.pathLength = len(path)
+        return path
+
+    def noteSizes(self, frontierSize, closedSize):
+        if frontierSize > self.maxFrontier:
+            self.maxFrontier = frontierSize
+        if closedSize > self.maxClosed:
+            self.maxClosed = closedSize
 
+    def timeHeuristic(self, heuristic):
+        "Wraps heuristic so that its calls and running time are recorded here"
+        def timedHeuristic(state, problem=None):
+            start = time.time()
+            value = heuristic(state, problem)
+            self.heuristicTime += time.time() - start
+            self.heuristicCalls += 1
+            return value
+        return timedHeuristic
 
-def depthFirstSearch(problem):
+    def toDict(self):
+        return dict([(field, getattr(self, field)) for field in self.FIELDS])
+
+    def toJson(self):
+        return json.dumps(self.toDict(), indent=2, sort_keys=True)
+
+    def __str__(self):
+        lines = ['[SearchStats] %s' % self.algorithm,
+                 '  expanded %d, generated %d, duplicates %d' % (self.expanded, self.generated, self.duplicates),
+                 '  peak frontier %d, peak closed %d, ~%d KB' % (self.maxFrontier, self.maxClosed, self.approxBytes / 1024),
+                 '  wall %.3fs, cpu %.3fs' % (self.wallTime, self.cpuTime)]
+        if self.heuristicCalls:
+            lines.append('  heuristic: %d calls, %.3fs' % (self.heuristicCalls, self.heuristicTime))
+        if self.suboptimalityBound != None:
+            lines.append('  cost within %.3f of optimal' % self.suboptimalityBound)
+        return '\n'.join(lines)
+
+def acceptsStats(function):
+    "Returns whether a search function takes a stats argument"
+    code = getattr(function, 'func_code', None)
+    return code is not None and 'stats' in code.co_varnames[:code.co_argcount]
+
+# Rough per-entry costs used for SearchStats.approxBytes: a Node and its
+# heap entry and index slot for the frontier, a dict slot for the closed set.
+_FRONTIER_ENTRY_BYTES = sys.getsizeof(Node(None)) + sys.getsizeof([0, 0, None]) + 2 * 24
+_CLOSED_ENTRY_BYTES = 24
+
+
+def depthFirstSearch(problem, stats=None):
+    if stats is None:
+        stats = SearchStats()
+    stats.start('depthFirstSearch')
     if(problem.isGoalState(problem.getStartState())):
-        return problem.getStartState()
+        return stats.finish(problem.getStartState())
     frontier = util.Stack()
     visited = {}
-    initialNode = Node(problem.getStartState(),[], 0)
+    initialNode = Node(problem.getStartState())
     frontier.push(initialNode)
     while 1:
         if(frontier.isEmpty()):
-            return list()
+            return stats.finish(list())
         node = frontier.pop()
         if node.getPos() in visited:
+            stats.duplicates += 1
             continue
         visited[node.getPos()] = True
         if problem.isGoalState(node.getPos()):
-            return node.getPath()
+            return stats.finish(node.getPath())
         succ = problem.getSuccessors(node.getPos())
+        stats.expanded += 1
         for succNode in succ:
-            newPath = node.getPath()[:]
-            newPath.append(succNode[1])
-            tempNode = Node(succNode[0],newPath, node.getCost()+succNode[2])
-            frontier.push(tempNode)
+            frontier.push(node.child(*succNode))
+        stats.generated += len(succ)
+        stats.noteSizes(len(frontier.list), len(visited))
 
-def breadthFirstSearch(problem):
-    if(problem.isGoalState(problem.getStartState())):
-        return problem.getStartState()
-    frontier = util.Queue()
-    visited = {}
-    initialNode = Node(problem.getStartState(),[], 0)
-    frontier.push(initialNode)
-    while 1:
-        if(frontier.isEmpty()):
-            return list()
-        node = frontier.pop()
-        if node.getPos() in visited:
-            continue
-        visited[node.getPos()] = True
-        if problem.isGoalState(node.getPos()):
-            return node.getPath()
-        succ = problem.getSuccessors(node.getPos())
-        for succNode in succ:
-            newPath = node.getPath()[:]
-            newPath.append(succNode[1])
-            tempNode = Node(succNode[0],newPath, node.getCost()+succNode[2])
-            tempStack = util.Queue()
-            insertTemp = True
-            while not frontier.isEmpty():
-                nPrime = frontier.pop()
-                if nPrime.getPos()==tempNode.getPos():
-                    if tempNode.getCost()<nPrime.getCost():
-                        continue
-                    else:
-                        insertTemp = False
-                tempStack.push(nPrime)
-            while not tempStack.isEmpty():
-                frontier.push(tempStack.pop())
-            if insertTemp:
-                frontier.push(tempNode)
-
-def uniformCostSearch(problem):
+def breadthFirstSearch(problem, stats=None):
+    if stats is None:
+        stats = SearchStats()
+    stats.start('breadthFirstSearch')
     if(problem.isGoalState(problem.getStartState())):
-        return problem.getStartState()
-    frontier = util.PriorityQueue()
+        return stats.finish(problem.getStartState())
+    # Every entry has the same priority, so the indexed heap pops in FIFO
+    # order; a cheaper path to a queued state moves it to the back.
+    frontier = util.IndexedPriorityQueue()
+    frontierNodes = {}
     visited = {}
-    initialNode = Node(problem.getStartState(),[], 0)
-    frontier.push(initialNode, 0)
+    initialNode = Node(problem.getStartState())
+    frontier.push(initialNode.getPos(), 0)
+    frontierNodes[initialNode.getPos()] = initialNode
     while 1:
         if(frontier.isEmpty()):
-            return list()
-        node = frontier.pop()
-        if node.getPos() in visited:
-            continue
+            return stats.finish(list())
+        node = frontierNodes.pop(frontier.pop())
         visited[node.getPos()] = True
         if problem.isGoalState(node.getPos()):
-            return node.getPath()
+            return stats.finish(node.getPath())
         succ = problem.getSuccessors(node.getPos())
+        stats.expanded += 1
         for succNode in succ:
-            newPath = node.getPath()[:]
-            newPath.append(succNode[1])
-            tempNode = Node(succNode[0],newPath, node.getCost()+succNode[2])
-            tempStack = util.PriorityQueue()
-            insertTemp = True
-            while not frontier.isEmpty():
-                nPrime = frontier.pop()
-                if nPrime.getPos()==tempNode.getPos():
-                    if tempNode.getCost()<nPrime.getCost():
-                        continue
-                    else:
-                        insertTemp = False
-                tempStack.push(nPrime, nPrime.getCost())
-            while not tempStack.isEmpty():
-                bestNode = tempStack.pop()
-                frontier.push(bestNode, bestNode.getCost())
-            if insertTemp:
-                frontier.push(tempNode, tempNode.getCost())
+            if succNode[0] in visited:
+                stats.duplicates += 1
+                continue
+            newCost = node.getCost()+succNode[2]
+            if succNode[0] in frontier:
+                if not newCost < frontierNodes[succNode[0]].getCost():
+                    stats.duplicates += 1
+                    continue
+                frontier.remove(succNode[0])
+            frontier.push(succNode[0], 0)
+            frontierNodes[succNode[0]] = node.child(*succNode)
+            stats.generated += 1
+        stats.noteSizes(len(frontier), len(visited))
+
+def uniformCostSearch(problem, stats=None):
+    if stats is None:
+        stats = SearchStats()
+    path = aStarSearch(problem, stats=stats)
+    stats.algorithm = 'uniformCostSearch'
+    return path
+
+def unitCost(state):
+    """
+    The default step cost function of PositionSearchProblem: every step
+    costs 1.  Searches that rely on unit steps check a problem's costFn
+    against it.
+    """
+    return 1
 
 def nullHeuristic(state, problem=None):
     """
@@ -196,46 +300,633 @@ def getHeuristicCost(problem, heuristic, node):
     return heuristic(node.getPos(), problem)
 
 
-def aStarSearch(problem, heuristic=nullHeuristic):
+def newFrontier():
+    """
+    Returns an empty priority queue for the best-first searches.  Whole-number
+    priorities, the usual case, share FIFO buckets in a BucketHeapQueue; it
+    turns into an IndexedPriorityQueue at the first fractional one, and both
+    pop items in the same order.
+    """
+    return util.BucketHeapQueue()
+
+def aStarSearch(problem, heuristic=nullHeuristic, stats=None):
     """Search the node that has the lowest combined cost and heuristic first."""
+    if stats is None:
+        stats = SearchStats()
+    elif heuristic is not nullHeuristic:
+        heuristic = stats.timeHeuristic(heuristic)
+    stats.start('aStarSearch')
     if(problem.isGoalState(problem.getStartState())):
-        return problem.getStartState()
-    frontier = util.PriorityQueue()
+        return stats.finish(problem.getStartState())
+    frontier = newFrontier()
+    frontierNodes = {}
     visited = {}
-    initialNode = Node(problem.getStartState(),[], 0)
-    frontier.push(initialNode, getFCost(problem, heuristic, initialNode))
+    initialNode = Node(problem.getStartState())
+    frontier.push(initialNode.getPos(), getFCost(problem, heuristic, initialNode))
+    frontierNodes[initialNode.getPos()] = initialNode
     while 1:
         if(frontier.isEmpty()):
-            return list()
-        node = frontier.pop()
-        if node.getPos() in visited:
-            continue
+            return stats.finish(list())
+        node = frontierNodes.pop(frontier.pop())
         visited[node.getPos()] = True
         if problem.isGoalState(node.getPos()):
-            return node.getPath()
+            return stats.finish(node.getPath())
         succ = problem.getSuccessors(node.getPos())
+        stats.expanded += 1
         for succNode in succ:
-            newPath = node.getPath()[:]
-            newPath.append(succNode[1])
-            tempNode = Node(succNode[0], newPath, node.getCost() + succNode[2])
-            #Test for heuristic consistency
-            #if succNode[2]+getHeuristicCost(problem, heuristic, tempNode)<getHeuristicCost(problem, heuristic, node):
-                #print "Not consistent, rip :'(", succNode[2], getFCost(problem, heuristic, tempNode), getFCost(problem, heuristic, node)
-            tempStack = util.PriorityQueue()
-            insertTemp = True
-            while not frontier.isEmpty():
-                nPrime = frontier.pop()
-                if nPrime.getPos()==tempNode.getPos():
-                    if getFCost(problem, heuristic, tempNode)<getFCost(problem, heuristic, nPrime):
-                        continue
-                    else:
-                        insertTemp = False
-                tempStack.push(nPrime, getFCost(problem, heuristic, nPrime))
-            while not tempStack.isEmpty():
-                bestNode = tempStack.pop()
-                frontier.push(bestNode, getFCost(problem, heuristic, bestNode))
-            if insertTemp:
-                frontier.push(tempNode, getFCost(problem, heuristic, tempNode))
+            if succNode[0] in visited:
+                stats.duplicates += 1
+                continue
+            newCost = node.getCost() + succNode[2]
+            # A queued state keeps its heuristic value, so comparing path
+            # costs is the same as comparing f-costs.
+            if succNode[0] in frontier and not newCost < frontierNodes[succNode[0]].getCost():
+                stats.duplicates += 1
+                continue
+            tempNode = node.child(*succNode)
+            frontierNodes[succNode[0]] = tempNode
+            frontier.push(succNode[0], getFCost(problem, heuristic, tempNode))
+            stats.generated += 1
+        stats.noteSizes(len(frontier), len(visited))
+
+
+def anytimeAStarSearch(problem, heuristic=nullHeuristic, timeBudget=None,
+                       initialWeight=3.0, weightStep=0.5, stats=None):
+    """
+    Anytime Repairing A* (ARA*).  Runs weighted A*, ordering nodes by
+    g + w * h, to get a first path quickly, then lowers w and repairs the
+    previous search instead of starting over: only states whose cost
+    improved since they were expanded are put back on the frontier.
+
+    The first path is always found, however long it takes.  After that the
+    search stops improving once timeBudget seconds have passed since it
+    started (None means keep going until the path is optimal).  The best
+    path found is returned, even if the pass that found it was cut short,
+    and stats.suboptimalityBound is set to the factor by which its cost may
+    exceed the optimal cost, which assumes the heuristic is admissible.
+    """
+    if stats is None:
+        stats = SearchStats()
+    elif heuristic is not nullHeuristic:
+        heuristic = stats.timeHeuristic(heuristic)
+    stats.start('anytimeAStarSearch')
+    deadline = None
+    if timeBudget != None:
+        deadline = time.time() + timeBudget
+
+    start = problem.getStartState()
+    if problem.isGoalState(start):
+        stats.suboptimalityBound = 1.0
+        return stats.finish([])
+    g = {start: 0}
+    h = {start: heuristic(start, problem)}
+    parents = {start: None}         # state -> (parent state, action)
+    closed = {}
+    inconsistent = {}
+    frontier = util.IndexedPriorityQueue()
+    frontier.push(start, initialWeight * h[start])
+    bestGoal = None
+    bestPath, bestCost = [], None
+    weight = initialWeight
+
+    def improvePath(weight, interruptible):
+        "Expands states until the best goal's cost is at most the smallest priority"
+        goal = bestGoal
+        while not frontier.isEmpty():
+            state, priority = frontier.popWithPriority()
+            if goal is not None and not priority < g[goal]:
+                frontier.push(state, priority)
+                break
+            if interruptible and deadline != None and time.time() > deadline:
+                frontier.push(state, priority)
+                return goal, False
+            closed[state] = True
+            succ = problem.getSuccessors(state)
+            stats.expanded += 1
+            for nextState, action, stepCost in succ:
+                newCost = g[state] + stepCost
+                if nextState in g and not newCost < g[nextState]:
+                    stats.duplicates += 1
+                    continue
+                g[nextState] = newCost
+                parents[nextState] = (state, action)
+                stats.generated += 1
+                if nextState not in h:
+                    h[nextState] = heuristic(nextState, problem)
+                if problem.isGoalState(nextState) and (goal is None or newCost < g[goal]):
+                    goal = nextState
+                if nextState in closed:
+                    inconsistent[nextState] = True
+                else:
+                    frontier.push(nextState, newCost + weight * h[nextState])
+            stats.noteSizes(len(frontier) + len(inconsistent), len(closed))
+        return goal, True
+
+    def pathTo(state):
+        path = []
+        while parents[state] is not None:
+            state, action = parents[state]
+            path.append(action)
+        path.reverse()
+        return path
+
+    def currentBound(weight):
+        "The weight, tightened by the smallest g + h of any unexpanded state"
+        lowest = None
+        for state in frontier.index.keys() + inconsistent.keys():
+            f = g[state] + h[state]
+            if lowest == None or f < lowest:
+                lowest = f
+        if lowest == None:
+            return 1.0          # nothing left to expand or repair
+        if lowest <= 0:
+            return weight
+        return max(1.0, min(weight, g[bestGoal] / float(lowest)))
+
+    while True:
+        bestGoal, finished = improvePath(weight, bestGoal is not None)
+        if bestGoal is None:
+            return stats.finish([])
+        if finished:
+            bestPath, bestCost = pathTo(bestGoal), g[bestGoal]
+            stats.suboptimalityBound = currentBound(weight)
+        elif g[bestGoal] < bestCost:
+            # The pass ran out of time after finding a cheaper goal.  The
+            # last bound still holds for the old cost, so scaling it by the
+            # saving keeps it safe for the new one.
+            stats.suboptimalityBound = max(1.0, stats.suboptimalityBound * g[bestGoal] / float(bestCost))
+            bestPath, bestCost = pathTo(bestGoal), g[bestGoal]
+        if not finished or stats.suboptimalityBound <= 1.0:
+            break
+        if deadline != None and time.time() > deadline:
+            break
+        # Lower the weight, put back the states whose cost improved after
+        # they were expanded, and re-key the frontier for the new weight.
+        weight = max(1.0, weight - weightStep)
+        queued = frontier.index.keys() + inconsistent.keys()
+        frontier = util.IndexedPriorityQueue()
+        for state in queued:
+            frontier.push(state, g[state] + weight * h[state])
+        inconsistent.clear()
+        closed.clear()
+    return stats.finish(bestPath)
+
+
+def iterativeDeepeningAStarSearch(problem, heuristic=nullHeuristic, stats=None):
+    """
+    IDA*: repeated depth-first searches, each cut off at nodes whose
+    g + h exceeds a bound that starts at h(start) and rises to the smallest
+    f-cost cut off by the previous search.  Only the current path is kept,
+    so memory grows with the depth of the solution rather than with the
+    number of states, at the price of re-expanding states on every pass and
+    of reaching them again by every path that does not revisit a state.
+    Paths are optimal when the heuristic is admissible.
+    """
+    if stats is None:
+        stats = SearchStats()
+    elif heuristic is not nullHeuristic:
+        heuristic = stats.timeHeuristic(heuristic)
+    stats.start('iterativeDeepeningAStarSearch')
+    start = problem.getStartState()
+    if problem.isGoalState(start):
+        return stats.finish([])
+    bound = heuristic(start, problem)
+    while True:
+        smallest = None             # lowest f-cost over the bound
+        onPath = {start: True}
+        actions = []
+        stack = [(start, 0, iter(problem.getSuccessors(start)))]
+        stats.expanded += 1
+        while stack:
+            state, g, successors = stack[-1]
+            for nextState, action, stepCost in successors:
+                if nextState in onPath:
+                    stats.duplicates += 1
+                    continue
+                stats.generated += 1
+                newCost = g + stepCost
+                f = newCost + heuristic(nextState, problem)
+                if f > bound:
+                    if smallest is None or f < smallest:
+                        smallest = f
+                    continue
+                actions.append(action)
+                if problem.isGoalState(nextState):
+                    return stats.finish(actions)
+                onPath[nextState] = True
+                stack.append((nextState, newCost, iter(problem.getSuccessors(nextState))))
+                stats.expanded += 1
+                stats.noteSizes(len(stack), len(onPath))
+                break
+            else:
+                stack.pop()
+                del onPath[state]
+                if stack:
+                    actions.pop()
+        if smallest is None:
+            return stats.finish([])
+        bound = smallest
+
+
+class BoundedNode(Node):
+    """
+    A node of the partial search tree kept by smaStarSearch.  Besides its
+    state and path it holds its successors, the f-cost of each one not in
+    memory (pending), and the children that are.
+    """
+    __slots__ = ('f', 'depth', 'index', 'successors', 'pending', 'children')
+
+    def __init__(self, position, parent=None, action=None, totalCost=0):
+        Node.__init__(self, position, parent, action, totalCost)
+        self.f = 0
+        self.depth = 0
+        self.index = None       # position among the parent's successors
+        self.successors = []
+        self.pending = {}       # successor index -> f-cost
+        self.children = {}      # successor index -> BoundedNode
+
+SMA_DEFAULT_MAX_NODES = 100000
+
+def smaStarSearch(problem, heuristic=nullHeuristic, maxNodes=SMA_DEFAULT_MAX_NODES, stats=None):
+    """
+    Simplified memory-bounded A* (SMA*, Russell 1992).  Runs A* but keeps
+    at most maxNodes search nodes.  When memory is full, the leaf with the
+    highest f-cost is forgotten and its f-cost is backed up into its
+    parent, which regenerates the leaf if its subtree ever looks best
+    again.  Less memory means more re-expansion, never a worse path: the
+    result is optimal when the heuristic is admissible and the optimal path
+    has fewer than maxNodes steps, and [] if no path fits in memory.
+
+    States already in memory with a path at least as cheap are not
+    generated again, which keeps the search from walking around cycles.
+    """
+    if stats is None:
+        stats = SearchStats()
+    elif heuristic is not nullHeuristic:
+        heuristic = stats.timeHeuristic(heuristic)
+    stats.start('smaStarSearch')
+    start = problem.getStartState()
+    if problem.isGoalState(start):
+        return stats.finish([])
+    infinity = float('inf')
+    frontier = util.IndexedPriorityQueue()  # nodes with successors not in memory
+    leaves = util.IndexedPriorityQueue()    # nodes that can be forgotten
+    inMemory = {}                           # state -> cheapest node holding it
+
+    def expand(node):
+        node.successors = problem.getSuccessors(node.getPos())
+        stats.expanded += 1
+        for i in range(len(node.successors)):
+            nextState, action, stepCost = node.successors[i]
+            if node.depth + 1 >= maxNodes - 1 and not problem.isGoalState(nextState):
+                node.pending[i] = infinity      # too deep to ever hold a path through it
+            else:
+                node.pending[i] = max(node.f, node.getCost() + stepCost + heuristic(nextState, problem))
+
+    def refresh(node):
+        "Requeues node after its pending successors or children changed"
+        if node.pending:
+            frontier.push(node, (min(node.pending.values()), -node.depth))
+        elif node in frontier:
+            frontier.remove(node)
+        if node.pending and not node.children and node.parent is not None:
+            leaves.push(node, (-min(node.pending.values()), node.depth))
+        elif node in leaves:
+            leaves.remove(node)
+
+    def discard(node, backedUpCost):
+        """
+        Drops node from memory.  With a backedUpCost its parent keeps it as
+        a pending successor of that f-cost; without one it is dropped for
+        good, along with any ancestors it leaves with nothing to search.
+        Returns the number of nodes dropped.
+        """
+        dropped = 0
+        while node.parent is not None:
+            if node in frontier:
+                frontier.remove(node)
+            if node in leaves:
+                leaves.remove(node)
+            if inMemory.get(node.getPos()) is node:
+                del inMemory[node.getPos()]
+            parent = node.parent
+            del parent.children[node.index]
+            dropped += 1
+            if backedUpCost is not None:
+                parent.pending[node.index] = backedUpCost
+            refresh(parent)
+            if parent.pending or parent.children:
+                break
+            node = parent
+        return dropped
+
+    root = BoundedNode(start)
+    root.f = heuristic(start, problem)
+    expand(root)
+    inMemory[start] = root
+    refresh(root)
+    size = 1
+    while not frontier.isEmpty():
+        node, (f, negDepth) = frontier.peek()
+        if f == infinity:
+            break
+        best = min([(node.pending[i], i) for i in node.pending])[1]
+        del node.pending[best]
+        nextState, action, stepCost = node.successors[best]
+        cost = node.getCost() + stepCost
+        stats.generated += 1
+        if problem.isGoalState(nextState):
+            return stats.finish(node.child(nextState, action, stepCost).getPath())
+        known = inMemory.get(nextState)
+        if known is not None and not cost < known.getCost():
+            stats.duplicates += 1
+            refresh(node)
+            if not node.pending and not node.children:
+                size -= discard(node, None)
+            continue
+        if size >= maxNodes:
+            # Forget the worst leaf other than node itself
+            if node in leaves:
+                leaves.remove(node)
+            if leaves.isEmpty():
+                node.pending[best] = infinity
+                refresh(node)
+                continue
+            worst, (negF, depth) = leaves.peek()
+            size -= discard(worst, -negF)
+            refresh(node)
+
+        child = BoundedNode(nextState, node, action, cost)
+        child.f = f
+        child.depth = node.depth + 1
+        child.index = best
+        node.children[best] = child
+        inMemory[nextState] = child
+        size += 1
+        expand(child)
+        refresh(node)
+        refresh(child)
+        if not child.pending:
+            size -= discard(child, None)
+        stats.noteSizes(len(frontier), size)
+    return stats.finish([])
+
+
+def bidirectionalSearch(problem, stats=None):
+    """
+    Bidirectional uniform cost search: one search forward from the start
+    and one backward from the goal, each expanding its cheapest node in
+    turn, until no path through the unexpanded nodes can beat the cheapest
+    meeting point found so far.  Each side only has to cover about half the
+    distance, which saves most of the work on open layouts.
+
+    The problem must define getGoalState() and getPredecessors(state) (see
+    SearchProblem); problems that do not, or whose getGoalState() returns
+    None, are handed to uniformCostSearch instead.
+    """
+    if getattr(problem, 'getPredecessors', None) is None or \
+            getattr(problem, 'getGoalState', None) is None or problem.getGoalState() is None:
+        return uniformCostSearch(problem, stats)
+    if stats is None:
+        stats = SearchStats()
+    stats.start('bidirectionalSearch')
+    start, goal = problem.getStartState(), problem.getGoalState()
+    if start == goal:
+        return stats.finish([])
+
+    # Index 0 is the forward search, index 1 the backward one.  A backward
+    # parent entry (state, action) means action leads *to* state.
+    expand = [problem.getSuccessors, problem.getPredecessors]
+    costs = [{start: 0}, {goal: 0}]
+    parents = [{start: None}, {goal: None}]
+    closed = [{}, {}]
+    frontiers = [util.IndexedPriorityQueue(), util.IndexedPriorityQueue()]
+    frontiers[0].push(start, 0)
+    frontiers[1].push(goal, 0)
+    bestCost, meeting = None, None
+    while not frontiers[0].isEmpty() and not frontiers[1].isEmpty():
+        forwardTop = frontiers[0].peek()[1]
+        backwardTop = frontiers[1].peek()[1]
+        if bestCost != None and forwardTop + backwardTop >= bestCost:
+            break
+        side = 0
+        if backwardTop < forwardTop or (backwardTop == forwardTop and len(frontiers[1]) < len(frontiers[0])):
+            side = 1
+        state, cost = frontiers[side].popWithPriority()
+        closed[side][state] = True
+        succ = expand[side](state)
+        stats.expanded += 1
+        for nextState, action, stepCost in succ:
+            newCost = cost + stepCost
+            if nextState in closed[side] or (nextState in costs[side] and not newCost < costs[side][nextState]):
+                stats.duplicates += 1
+                continue
+            costs[side][nextState] = newCost
+            parents[side][nextState] = (state, action)
+            frontiers[side].push(nextState, newCost)
+            stats.generated += 1
+            if nextState in costs[1 - side]:
+                total = newCost + costs[1 - side][nextState]
+                if bestCost == None or total < bestCost:
+                    bestCost, meeting = total, nextState
+        stats.noteSizes(len(frontiers[0]) + len(frontiers[1]), len(closed[0]) + len(closed[1]))
+
+    if meeting is None:
+        return stats.finish([])
+    path = []
+    state = meeting
+    while parents[0][state] is not None:
+        state, action = parents[0][state]
+        path.append(action)
+    path.reverse()
+    state = meeting
+    while parents[1][state] is not None:
+        state, action = parents[1][state]
+        path.append(action)
+    return stats.finish(path)
+
+
+def jumpPointSearch(problem, stats=None):
+    """
+    Jump Point Search for 4-connected grids with unit step costs, such as
+    PositionSearchProblem and AnyFoodSearchProblem.  It is A* in which a
+    node's successors are found by scanning in a straight line from it until
+    the scan reaches a goal or a cell where an optimal path may have to turn
+    (a jump point).  Cells along corridors are never queued, so far fewer
+    nodes are expanded, and the path found is still optimal.
+
+    Paths are canonicalized as horizontal-first: a horizontal scan may turn
+    vertically at any cell, so it stops wherever a vertical scan from it
+    would reach a jump point, while a vertical scan only stops where a wall
+    has just ended beside it (a forced neighbor).
+
+    The problem needs a walls Grid, (x,y) position states and unit step
+    costs (no costFn, or unitCost); anything else, such as the weighted
+    problems of StayEastSearchAgent, is handed to uniformCostSearch.
+    Manhattan distance to the goal is used as the heuristic when the problem
+    has a single goal state.
+    """
+    from game import Directions
+    start = problem.getStartState()
+    walls = getattr(problem, 'walls', None)
+    if walls is None or getattr(problem, 'costFn', unitCost) is not unitCost or \
+            not (isinstance(start, tuple) and len(start) == 2 and isinstance(start[0], int)):
+        return uniformCostSearch(problem, stats)
+    if stats is None:
+        stats = SearchStats()
+    stats.start('jumpPointSearch')
+    isGoal = problem.isGoalState
+    if isGoal(start):
+        return stats.finish([])
+    goal = None
+    if getattr(problem, 'getGoalState', None) is not None:
+        goal = problem.getGoalState()
+    if goal is None:
+        estimate = lambda cell: 0
+    else:
+        estimate = lambda cell: abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])
+
+    def passable(x, y):
+        return 0 <= x < walls.width and 0 <= y < walls.height and not walls[x][y]
+
+    def jumpVertical(x, y, dy):
+        while True:
+            y += dy
+            if not passable(x, y):
+                return None
+            if isGoal((x, y)):
+                return (x, y)
+            if (passable(x + 1, y) and not passable(x + 1, y - dy)) or \
+               (passable(x - 1, y) and not passable(x - 1, y - dy)):
+                return (x, y)
+
+    def jumpHorizontal(x, y, dx):
+        while True:
+            x += dx
+            if not passable(x, y):
+                return None
+            if isGoal((x, y)):
+                return (x, y)
+            if jumpVertical(x, y, 1) is not None or jumpVertical(x, y, -1) is not None:
+                return (x, y)
+
+    def directions(cell, parent):
+        "The scan directions worth trying from cell, given the cell it was reached from"
+        if parent is None:
+            return [(1, 0), (-1, 0), (0, 1), (0, -1)]
+        x, y = cell
+        dx = cmp(x, parent[0])
+        dy = cmp(y, parent[1])
+        if dy == 0:
+            return [(dx, 0), (0, 1), (0, -1)]
+        scans = [(0, dy)]
+        for side in (1, -1):
+            if passable(x + side, y) and not passable(x + side, y - dy):
+                scans.append((side, 0))
+        return scans
+
+    costs = {start: 0}
+    parents = {start: None}
+    closed = {}
+    frontier = util.IndexedPriorityQueue()
+    frontier.push(start, estimate(start))
+    found = None
+    while not frontier.isEmpty():
+        cell = frontier.pop()
+        closed[cell] = True
+        if cell != start and isGoal(cell):
+            found = cell
+            break
+        stats.expanded += 1
+        for dx, dy in directions(cell, parents[cell]):
+            if dy == 0:
+                jumpPoint = jumpHorizontal(cell[0], cell[1], dx)
+            else:
+                jumpPoint = jumpVertical(cell[0], cell[1], dy)
+            if jumpPoint is None:
+                continue
+            newCost = costs[cell] + abs(jumpPoint[0] - cell[0]) + abs(jumpPoint[1] - cell[1])
+            if jumpPoint in closed or (jumpPoint in costs and not newCost < costs[jumpPoint]):
+                stats.duplicates += 1
+                continue
+            costs[jumpPoint] = newCost
+            parents[jumpPoint] = cell
+            frontier.push(jumpPoint, newCost + estimate(jumpPoint))
+            stats.generated += 1
+        stats.noteSizes(len(frontier), len(closed))
+
+    if found is None:
+        return stats.finish([])
+    # Unroll the straight segments between jump points into single steps
+    path = []
+    cell = found
+    while parents[cell] is not None:
+        parent = parents[cell]
+        if cell[0] != parent[0]:
+            step = cell[0] > parent[0] and Directions.EAST or Directions.WEST
+        else:
+            step = cell[1] > parent[1] and Directions.NORTH or Directions.SOUTH
+        path.extend([step] * (abs(cell[0] - parent[0]) + abs(cell[1] - parent[1])))
+        cell = parent
+    path.reverse()
+    return stats.finish(path)
+
+def contractedSearch(problem, heuristic=nullHeuristic, stats=None):
+    """
+    A* over the corridor-contracted graph of the problem's maze (see
+    mazeGraph.py): each expansion follows a whole corridor to the next
+    junction, dead end or key position, and the corridors on the path found
+    are expanded back into single-step actions.  The heuristic is called
+    with the original problem, so any heuristic for it can be used.
+
+    The problem needs a walls Grid and the getKeyPositions and getStateAt
+    methods; anything else is handed to aStarSearch.
+    """
+    if getattr(problem, 'walls', None) is None or getattr(problem, 'getKeyPositions', None) is None:
+        return aStarSearch(problem, heuristic, stats)
+    import mazeGraph
+    if stats is None:
+        stats = SearchStats()
+    if problem.isGoalState(problem.getStartState()):
+        stats.start('contractedSearch')
+        return stats.finish([])
+    contracted = mazeGraph.ContractedSearchProblem(problem)
+    path = contracted.expandPath(aStarSearch(contracted, lambda state, p: heuristic(state, problem), stats))
+    stats.algorithm = 'contractedSearch'
+    stats.pathLength = len(path)
+    return path
+
+def hierarchicalSearch(problem, clusterSize=10, stats=None):
+    """
+    Hierarchical pathfinding (HPA*) for very large mazes with unit step
+    costs.  The maze is cut into clusterSize blocks whose entrances and
+    in-block distances are computed once per layout (see
+    mazeGraph.ClusterGraph); each search runs A* over the entrances only and
+    then fills in the cell-level path.  Paths are close to optimal but not
+    guaranteed to be shortest.
+
+    The problem needs a walls Grid, (x,y) position states, a single goal
+    from getGoalState() and unit step costs (no costFn, or unitCost);
+    anything else is handed to uniformCostSearch.
+    """
+    start = problem.getStartState()
+    walls = getattr(problem, 'walls', None)
+    goal = None
+    if getattr(problem, 'getGoalState', None) is not None:
+        goal = problem.getGoalState()
+    if walls is None or goal is None or getattr(problem, 'costFn', unitCost) is not unitCost or \
+            not (isinstance(start, tuple) and len(start) == 2 and isinstance(start[0], int)):
+        return uniformCostSearch(problem, stats)
+    import mazeGraph
+    if stats is None:
+        stats = SearchStats()
+    stats.start('hierarchicalSearch')
+    if problem.isGoalState(start):
+        return stats.finish([])
+    path = mazeGraph.getClusterGraph(walls, clusterSize).findPath(start, goal, stats)
+    if path is None:
+        return stats.finish([])
+    return stats.finish(path)
 
 
 # Abbreviations
@@ -243,3 +934,10 @@ bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+ara = anytimeAStarSearch
+idastar = iterativeDeepeningAStarSearch
+smastar = smaStarSearch
+bidi = bidirectionalSearch
+jps = jumpPointSearch
+contracted = contractedSearch
+hpa = hierarchicalSearch
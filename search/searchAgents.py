@@ -40,6 +40,9 @@ from game import Actions
 import util
 import time
 import search
+from search import unitCost
+import collections
+import mazeGraph
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
@@ -69,20 +72,36 @@ class SearchAgent(Agent):
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
 
+    If the search function records a search.SearchStats, the stats are
+    printed after the search; pass statsFile=<path> to also write them out
+    as JSON.  Anytime searches such as anytimeAStarSearch (ara) accept
+    timeBudget=<seconds>.
 
     Note: You should NOT change any code in SearchAgent
     """
 
-    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic'):
+    def __init__(self, fn='depthFirstSearch', prob='PositionSearchProblem', heuristic='nullHeuristic', statsFile=None, timeBudget=None):
+        self.statsFile = statsFile
+
         # Warning: some advanced Python magic is employed below to find the right functions and problems
 
         # Get the search function from the name and heuristic
         if fn not in dir(search):
             raise AttributeError, fn + ' is not a search function in search.py.'
         func = getattr(search, fn)
+        searchArgs = {}
+        if timeBudget != None:
+            if 'timeBudget' not in func.func_code.co_varnames:
+                raise AttributeError, fn + ' does not take a time budget.'
+            searchArgs['timeBudget'] = float(timeBudget)
         if 'heuristic' not in func.func_code.co_varnames:
             print('[SearchAgent] using function ' + fn)
-            self.searchFunction = func
+            if searchArgs and search.acceptsStats(func):
+                self.searchFunction = lambda x, stats=None: func(x, stats=stats, **searchArgs)
+            elif searchArgs:
+                self.searchFunction = lambda x: func(x, **searchArgs)
+            else:
+                self.searchFunction = func
         else:
             if heuristic in globals().keys():
                 heur = globals()[heuristic]
@@ -92,7 +111,10 @@ class SearchAgent(Agent):
                 raise AttributeError, heuristic + ' is not a function in searchAgents.py or search.py.'
             print('[SearchAgent] using function %s and heuristic %s' % (fn, heuristic))
             # Note: this bit of Python trickery combines the search algorithm and the heuristic
-            self.searchFunction = lambda x: func(x, heuristic=heur)
+            if search.acceptsStats(func):
+                self.searchFunction = lambda x, stats=None: func(x, heuristic=heur, stats=stats, **searchArgs)
+            else:
+                self.searchFunction = lambda x: func(x, heuristic=heur, **searchArgs)
 
         # Get the search problem type from the name
         if prob not in globals().keys() or not prob.endswith('Problem'):
@@ -112,10 +134,21 @@ class SearchAgent(Agent):
         if self.searchFunction == None: raise Exception, "No search function provided for SearchAgent"
         starttime = time.time()
         problem = self.searchType(state) # Makes a new search problem
-        self.actions  = self.searchFunction(problem) # Find a path
+        self.searchStats = None
+        if search.acceptsStats(self.searchFunction):
+            self.searchStats = search.SearchStats()
+            self.actions  = self.searchFunction(problem, stats=self.searchStats) # Find a path
+        else:
+            self.actions  = self.searchFunction(problem) # Find a path
         totalCost = problem.getCostOfActions(self.actions)
         print('Path found with total cost of %d in %.1f seconds' % (totalCost, time.time() - starttime))
         if '_expanded' in dir(problem): print('Search nodes expanded: %d' % problem._expanded)
+        if self.searchStats != None:
+            print(self.searchStats)
+            if getattr(self, 'statsFile', None):
+                statsFile = open(self.statsFile, 'w')
+                try: statsFile.write(self.searchStats.toJson() + '\n')
+                finally: statsFile.close()
 
     def getAction(self, state):
         """
@@ -144,7 +177,7 @@ class PositionSearchProblem(search.SearchProblem):
     Note: this search problem is fully specified; you should NOT change it.
     """
 
-    def __init__(self, gameState, costFn = lambda x: 1, goal=(1,1), start=None, warn=True, visualize=True):
+    def __init__(self, gameState, costFn = unitCost, goal=(1,1), start=None, warn=True, visualize=True):
         """
         Stores the start and goal.
 
@@ -210,90 +243,23 @@ class PositionSearchProblem(search.SearchProblem):
 
         return successors
 
-    def getCostOfActions(self, actions):
-        """
-        Returns the cost of a particular sequence of actions. If those actions
-        include an illegal move, return 999999.
-        """
-        if actions == None: return 999999
-        x,y= self.getStartState()
-        cost = 0
-        for action in actions:
-            # Check figure out the next state and see whether its' legal
-            dx, dy = Actions.directionToVector(action)
-            x, y = int(x + dx), int(y + dy)
-            if self.walls[x][y]: return 999999
-            cost += self.costFn((x,y))
-        return cost
+    def getGoalState(self):
+        return self.goal
 
-class MyPositionSearchProblem(search.SearchProblem):
-    """
-    A search problem defines the state space, start state, goal test, successor
-    function and cost function.  This search problem can be used to find paths
-    to a particular point on the pacman board.
-
-    The state space consists of (x,y) positions in a pacman game.
-
-    Note: this search problem is fully specified; you should NOT change it.
-    """
-
-    def __init__(self, gameState, pos,  costFn = lambda x: 1, goal=(1,1), start=None, warn=False, visualize=False):
+    def getPredecessors(self, state):
         """
-        Stores the start and goal.
-
-        gameState: A GameState object (pacman.py)
-        costFn: A function from a search state (tuple) to a non-negative number
-        goal: A position in the gameState
+        Returns the states from which state can be reached in one step, as
+        (predecessor, action, stepCost) triples where action leads from the
+        predecessor to state.  Used by search.bidirectionalSearch.
         """
-        self.walls = gameState.getWalls()
-        self.startState = pos
-        if start != None: self.startState = start
-        self.goal = goal
-        self.costFn = costFn
-        self.visualize = visualize
-        if warn and (gameState.getNumFood() != 1 or not gameState.hasFood(*goal)):
-            print 'Warning: this does not look like a regular search maze'
-
-        # For display purposes
-        self._visited, self._visitedlist, self._expanded = {}, [], 0 # DO NOT CHANGE
-
-    def getStartState(self):
-        return self.startState
-
-    def isGoalState(self, state):
-        isGoal = state == self.goal
-
-        # For display purposes only
-        if isGoal and self.visualize:
-            self._visitedlist.append(state)
-            import __main__
-            if '_display' in dir(__main__):
-                if 'drawExpandedCells' in dir(__main__._display): #@UndefinedVariable
-                    __main__._display.drawExpandedCells(self._visitedlist) #@UndefinedVariable
-
-        return isGoal
-
-    def getSuccessors(self, state):
-        """
-        Returns successor states, the actions they require, and a cost of 1.
-
-         As noted in search.py:
-             For a given state, this should return a list of triples,
-         (successor, action, stepCost), where 'successor' is a
-         successor to the current state, 'action' is the action
-         required to get there, and 'stepCost' is the incremental
-         cost of expanding to that successor
-        """
-
-        successors = []
+        predecessors = []
+        stepCost = self.costFn(state)
         for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
             x,y = state
             dx, dy = Actions.directionToVector(action)
-            nextx, nexty = int(x + dx), int(y + dy)
-            if not self.walls[nextx][nexty]:
-                nextState = (nextx, nexty)
-                cost = self.costFn(nextState)
-                successors.append( ( nextState, action, cost) )
+            prevx, prevy = int(x - dx), int(y - dy)
+            if not self.walls[prevx][prevy]:
+                predecessors.append( ( (prevx, prevy), action, stepCost) )
 
         # Bookkeeping for display purposes
         self._expanded += 1 # DO NOT CHANGE
@@ -301,7 +267,7 @@ class MyPositionSearchProblem(search.SearchProblem):
             self._visited[state] = True
             self._visitedlist.append(state)
 
-        return successors
+        return predecessors
 
     def getCostOfActions(self, actions):
         """
@@ -319,6 +285,15 @@ class MyPositionSearchProblem(search.SearchProblem):
             cost += self.costFn((x,y))
         return cost
 
+    def getKeyPositions(self):
+        """
+        Returns the positions that must stay nodes when this problem is run
+        over a corridor-contracted graph (see mazeGraph.py).
+        """
+        return [self.startState, self.goal]
+
+    def getStateAt(self, state, position):
+        return position
 
 class StayEastSearchAgent(SearchAgent):
     """
@@ -356,6 +331,19 @@ def euclideanHeuristic(position, problem, info={}):
     xy2 = problem.goal
     return ( (xy1[0] - xy2[0]) ** 2 + (xy1[1] - xy2[1]) ** 2 ) ** 0.5
 
+def landmarkHeuristic(position, problem):
+    """
+    The ALT landmark heuristic for a PositionSearchProblem: a lower bound on
+    the maze distance to the goal from the triangle inequality over BFS
+    distances to a few landmark cells (see mazeGraph.Landmarks).  The tables
+    are built once per layout by mazeGraph.getLandmarks, which keeps them for
+    the most recently used layouts.
+    """
+    goal = problem.getGoalState()
+    if goal is None:
+        return 0
+    return mazeGraph.getLandmarks(problem.walls).lowerBound(position, goal)
+
 #####################################################
 # This portion is incomplete.  Time to write code!  #
 #####################################################
@@ -381,8 +369,22 @@ class CornersProblem(search.SearchProblem):
         self._expanded = 0 # DO NOT CHANGE; Number of search nodes expanded
         # Please add any code here which you would like to use
         # in initializing the problem
-        self.cornerDists = {}
-        self.startState = startingGameState
+
+        # One BFS distance field per corner, plus tourCosts[i][mask]: the
+        # length of the shortest walk from corner i through every corner
+        # whose bit is set in mask (a bitmask over the indices of corners).
+        self.cornerFields = [mazeDistanceField(self.walls, corner) for corner in self.corners]
+        self.tourCosts = [[0] * 16 for corner in self.corners]
+        for mask in range(1, 16):
+            for i in range(4):
+                if mask & (1 << i):
+                    continue
+                best = 999999
+                for j in range(4):
+                    if mask & (1 << j):
+                        step = self.cornerFields[i].get(self.corners[j], 999999)
+                        best = min(best, step + self.tourCosts[j][mask & ~(1 << j)])
+                self.tourCosts[i][mask] = best
 
     def getStartState(self):
         """
@@ -433,6 +435,18 @@ class CornersProblem(search.SearchProblem):
         self._expanded += 1
         return successors
 
+    def getKeyPositions(self):
+        return [self.startingPosition] + list(self.corners)
+
+    def getStateAt(self, state, position):
+        cornersBool = state[1]
+        for i in range(4):
+            if position == self.corners[i]:
+                cornersBool = list(cornersBool)
+                cornersBool[i] = True
+                cornersBool = tuple(cornersBool)
+        return (position, cornersBool)
+
     def getCostOfActions(self, actions):
         """
         Returns the cost of a particular sequence of actions.  If those actions
@@ -453,91 +467,40 @@ def manhattanDistance(pos1, pos2):
     xy2 = pos2
     return abs(xy1[0] - xy2[0]) + abs(xy1[1] - xy2[1])
 
-def distBetweenCorners(pos, cornerList, problem):
-    if len(cornerList)==0:
-        return 0
-    totalCost = 0
-    for i in range(len(cornerList)):
-        if cornerList[i][0]==pos[0] or cornerList[i][1]==pos[1]:
-            if (pos, cornerList[i]) not in problem.cornerDists:
-                newProb = MyPositionSearchProblem(problem.startState, pos, goal=cornerList[i])
-                cost = newUniformCostSearch(pos, newProb)
-                problem.cornerDists[(pos, cornerList[i])]=cost
-                problem.cornerDists[(cornerList[i], pos)] = cost
-            totalCost= totalCost + problem.cornerDists[(pos,cornerList[i])]
-            pos = cornerList[i]
-            del(cornerList[i])
-            return totalCost + distBetweenCorners(pos, cornerList, problem)
-    if (pos, cornerList[0]) not in problem.cornerDists:
-        newProb = MyPositionSearchProblem(problem.startState, pos, goal=cornerList[0])
-        cost = newUniformCostSearch(pos, newProb)
-        problem.cornerDists[(pos, cornerList[0])] = cost
-        problem.cornerDists[(cornerList[0], pos)] = cost
-    return problem.cornerDists[(pos,cornerList[0])]
-
-def newUniformCostSearch(pos, problem):
-    if(problem.isGoalState(pos)):
-        return 0
-    frontier = util.PriorityQueue()
-    visited = {}
-    initialNode = search.Node(pos,[], 0)
-    frontier.push(initialNode, 0)
-    totalPath = 0
-    while 1:
-        if(frontier.isEmpty()):
-            return 99999999999999999999
-        node = frontier.pop()
-        if node.getPos() in visited:
-            continue
-        visited[node.getPos()] = True
-        if problem.isGoalState(node.getPos()):
-            return node.getCost()
-        succ = problem.getSuccessors(node.getPos())
-        for succNode in succ:
-            newPath = node.getPath()[:]
-            newPath.append(succNode[1])
-            tempNode = search.Node(succNode[0],newPath, node.getCost()+succNode[2])
-            tempStack = util.PriorityQueue()
-            insertTemp = True
-            while not frontier.isEmpty():
-                nPrime = frontier.pop()
-                if nPrime.getPos()==tempNode.getPos():
-                    if tempNode.getCost()<nPrime.getCost():
-                        continue
-                    else:
-                        insertTemp = False
-                tempStack.push(nPrime, nPrime.getCost())
-            while not tempStack.isEmpty():
-                bestNode = tempStack.pop()
-                frontier.push(bestNode, bestNode.getCost())
-            if insertTemp:
-                frontier.push(tempNode, tempNode.getCost())
+def mazeDistanceField(walls, source):
+    """
+    Runs one breadth-first search from source over the walls Grid and
+    returns a dict mapping every reachable position to its maze distance.
+    """
+    dist = {source: 0}
+    frontier = collections.deque([source])
+    while frontier:
+        x, y = frontier.popleft()
+        d = dist[(x, y)] + 1
+        for nextPos in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+            if nextPos not in dist and not walls[nextPos[0]][nextPos[1]]:
+                dist[nextPos] = d
+                frontier.append(nextPos)
+    return dist
 
 def cornersHeuristic(state, problem):
-    cornersBool = state[1]
-    if all(cornersBool):
+    """
+    The exact cost of visiting the remaining corners from state, read from
+    the distance fields and tour table that CornersProblem precomputes.
+    """
+    position, cornersBool = state
+    remaining = 0
+    for i in range(4):
+        if not cornersBool[i]:
+            remaining |= 1 << i
+    if remaining == 0:
         return 0
-    corners = problem.corners # These are the corner coordinates
-    walls = problem.walls # These are the walls of the maze, as a Grid (game.py)
-    totalCost = [99999999999 for i in range(4)]
+    best = 999999
     for i in range(4):
-        cornersBool = state[1]
-        if cornersBool[i]:
-            totalCost[i] = 9999999999999
-        else:
-            #totalCost[i] = manhattanDistance(state[0], corners[i])
-            u = list()
-            u.append(corners[i])
-            totalCost[i] = distBetweenCorners(state[0], u, problem)
-            cornersBool = list(cornersBool)
-            cornersBool[i] = True
-            cornersBool = tuple(cornersBool)
-            unvisited = list()
-            for i in range(4):
-                if not cornersBool[i]:
-                    unvisited.append(corners[i])
-            totalCost[i] +=  distBetweenCorners(corners[i], unvisited, problem)
-    return min(totalCost)
+        if remaining & (1 << i):
+            toCorner = problem.cornerFields[i].get(position, 999999)
+            best = min(best, toCorner + problem.tourCosts[i][remaining & ~(1 << i)])
+    return best
 
 
 
@@ -545,9 +508,89 @@ def cornersHeuristic(state, problem):
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
     def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, cornersHeuristic)
+        self.searchFunction = lambda prob, stats=None: search.aStarSearch(prob, cornersHeuristic, stats)
         self.searchType = CornersProblem
 
+class FoodBitboard(object):
+    """
+    An immutable set of food positions packed into a single integer, with
+    bit (x * height + y) set when there is food at (x,y).  This is the same
+    cell order as Grid, so asList() comes out in the same order.
+
+    Unlike a Grid, a bitboard is shared rather than copied between search
+    states: eat() returns a new bitboard with one bit flipped, while the
+    hash and the food count are computed once, when the bitboard is made.
+    """
+    __slots__ = ('bits', 'width', 'height', '_count', '_hash')
+
+    def __init__(self, bits, width, height, count=None):
+        self.bits = bits
+        self.width = width
+        self.height = height
+        if count is None:
+            count = bin(bits).count('1')
+        self._count = count
+        self._hash = hash(bits)
+
+    def fromGrid(grid):
+        "Packs a boolean Grid (see game.py) into a bitboard"
+        bits = 0
+        height = grid.height
+        for x, y in grid.asList():
+            bits |= 1 << (x * height + y)
+        return FoodBitboard(bits, grid.width, height)
+    fromGrid = staticmethod(fromGrid)
+
+    def hasFood(self, x, y):
+        return (self.bits >> (x * self.height + y)) & 1 == 1
+
+    def eat(self, x, y):
+        "Returns the bitboard without the food at (x,y), if there was any"
+        bit = 1 << (x * self.height + y)
+        if not self.bits & bit:
+            return self
+        return FoodBitboard(self.bits ^ bit, self.width, self.height, self._count - 1)
+
+    def count(self, item=True):
+        if item:
+            return self._count
+        return self.width * self.height - self._count
+
+    def asList(self, key=True):
+        if not key:
+            return [(x, y) for x in range(self.width) for y in range(self.height)
+                    if not self.hasFood(x, y)]
+        cells = []
+        bits = self.bits
+        height = self.height
+        while bits:
+            low = bits & -bits
+            index = low.bit_length() - 1
+            cells.append((index // height, index % height))
+            bits ^= low
+        return cells
+
+    def copy(self):
+        return self
+
+    def __getitem__(self, x):
+        return [self.hasFood(x, y) for y in range(self.height)]
+
+    def __eq__(self, other):
+        if not isinstance(other, FoodBitboard): return False
+        return self.bits == other.bits and self.height == other.height
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self._hash
+
+    def __str__(self):
+        out = [[str(self.hasFood(x, y))[0] for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
 class FoodSearchProblem:
     """
     A search problem associated with finding the a path that collects all of the
@@ -555,10 +598,10 @@ class FoodSearchProblem:
 
     A search state in this problem is a tuple ( pacmanPosition, foodGrid ) where
       pacmanPosition: a tuple (x,y) of integers specifying Pacman's position
-      foodGrid:       a Grid (see game.py) of either True or False, specifying remaining food
+      foodGrid:       a FoodBitboard of the remaining food
     """
     def __init__(self, startingGameState):
-        self.start = (startingGameState.getPacmanPosition(), startingGameState.getFood())
+        self.start = (startingGameState.getPacmanPosition(), FoodBitboard.fromGrid(startingGameState.getFood()))
         self.walls = startingGameState.getWalls()
         self.startingGameState = startingGameState
         self._expanded = 0 # DO NOT CHANGE
@@ -579,8 +622,7 @@ class FoodSearchProblem:
             dx, dy = Actions.directionToVector(direction)
             nextx, nexty = int(x + dx), int(y + dy)
             if not self.walls[nextx][nexty]:
-                nextFood = state[1].copy()
-                nextFood[nextx][nexty] = False
+                nextFood = state[1].eat(nextx, nexty)
                 successors.append( ( ((nextx, nexty), nextFood), direction, 1) )
         return successors
 
@@ -598,10 +640,24 @@ class FoodSearchProblem:
             cost += 1
         return cost
 
+    def getKeyPositions(self):
+        return [self.start[0]] + self.start[1].asList()
+
+    def getStateAt(self, state, position):
+        return (position, state[1].eat(*position))
+
 class AStarFoodSearchAgent(SearchAgent):
-    "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
-    def __init__(self):
-        self.searchFunction = lambda prob: search.aStarSearch(prob, foodHeuristic)
+    """
+    A SearchAgent for FoodSearchProblem using A* and your foodHeuristic.
+    Pass tourThreshold=<n> to finish exactly with Held-Karp once at most n
+    food is left (see endgameFoodSearch).
+    """
+    def __init__(self, tourThreshold=None):
+        if tourThreshold is None:
+            self.searchFunction = lambda prob, stats=None: search.aStarSearch(prob, foodHeuristic, stats)
+        else:
+            threshold = int(tourThreshold)
+            self.searchFunction = lambda prob, stats=None: endgameFoodSearch(prob, foodHeuristic, threshold, stats)
         self.searchType = FoodSearchProblem
 
 def foodHeuristic(state, problem):
@@ -617,9 +673,9 @@ def foodHeuristic(state, problem):
     other hand, inadmissible or inconsistent heuristics may find optimal
     solutions, so be careful.
 
-    The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a Grid
-    (see game.py) of either True or False. You can call foodGrid.asList() to get
-    a list of food coordinates instead.
+    The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a
+    FoodBitboard of the remaining food.  You can call foodGrid.asList() to get
+    a list of food coordinates, or foodGrid.hasFood(x, y) to test one cell.
 
     If you want access to info like walls, capsules, etc., you can query the
     problem.  For example, problem.walls gives you a Grid of where the walls
@@ -633,12 +689,187 @@ def foodHeuristic(state, problem):
     problem.heuristicInfo['wallCount']
     """
     position, foodGrid = state
+    if foodGrid.count() == 0:
+        return 0
+    if not isinstance(foodGrid, FoodBitboard):
+        foodGrid = FoodBitboard.fromGrid(foodGrid)
     foodList = foodGrid.asList()
-    maxDist = 0
-    for food in foodList:
-        if manhattanDistance(position, food) >maxDist:
-            maxDist = manhattanDistance(position, food)
-    return maxDist
+
+    # Pacman has to reach some food first, and a walk through all the food
+    # is at least as long as a minimum spanning tree over it.
+    nearest = min([foodDistanceField(problem, food).get(position, 0) for food in foodList])
+    return nearest + foodSpanningTreeCost(problem, foodGrid)
+
+def foodDistanceField(problem, food):
+    "Returns the maze distances from a food cell, cached in problem.heuristicInfo"
+    fields = problem.heuristicInfo.setdefault('foodDistances', {})
+    if food not in fields:
+        fields[food] = mazeDistanceField(problem.walls, food)
+    return fields[food]
+
+FOOD_MST_CACHE_SIZE = 100000
+
+def foodSpanningTreeCost(problem, foodGrid):
+    """
+    Returns the weight of a minimum spanning tree over the food in foodGrid,
+    with edges weighted by maze distance.  Results are memoized by the food
+    mask in problem.heuristicInfo['foodMST'], which keeps the most recently
+    used FOOD_MST_CACHE_SIZE entries.
+    """
+    cache = problem.heuristicInfo.get('foodMST')
+    if cache is None:
+        cache = problem.heuristicInfo['foodMST'] = collections.OrderedDict()
+    key = foodGrid.bits
+    if key in cache:
+        cost = cache.pop(key)
+        cache[key] = cost
+        return cost
+
+    # Prim's algorithm on the complete graph of food cells
+    foodList = foodGrid.asList()
+    fields = [foodDistanceField(problem, food) for food in foodList]
+    best = [fields[0].get(food, 0) for food in foodList]
+    inTree = [False] * len(foodList)
+    inTree[0] = True
+    cost = 0
+    for step in range(len(foodList) - 1):
+        nextIndex = None
+        for i in range(len(foodList)):
+            if not inTree[i] and (nextIndex is None or best[i] < best[nextIndex]):
+                nextIndex = i
+        inTree[nextIndex] = True
+        cost += best[nextIndex]
+        field = fields[nextIndex]
+        for i in range(len(foodList)):
+            if not inTree[i]:
+                dist = field.get(foodList[i], 0)
+                if dist < best[i]:
+                    best[i] = dist
+
+    cache[key] = cost
+    if len(cache) > FOOD_MST_CACHE_SIZE:
+        cache.popitem(last=False)
+    return cost
+
+# Largest number of food left for which endgameFoodSearch solves the rest
+# of the problem exactly with Held-Karp.  The work grows as 2^n * n^2, and
+# in pure Python each extra dot roughly doubles both time and memory: one
+# tour on bigSearch takes 0.07s and 5k table entries for 10 dots, but 2.4s
+# and 115k entries (64MB) for 14, which extrapolates to about a minute and
+# over a gigabyte for 18.  Raise it with -a tourThreshold=<n> to trade
+# memory for fewer A* expansions.
+FOOD_TOUR_THRESHOLD = 10
+
+def foodTourCost(problem, position, foodGrid):
+    """
+    Returns the length of the shortest walk from position that eats all the
+    food in foodGrid, or None if some of it cannot be reached.
+
+    This is the Held-Karp dynamic program over maze distances between food
+    cells, computed top-down: the cost of finishing from a cell with a given
+    set of food left is memoized in problem.heuristicInfo['foodTours'], so
+    every state that reaches the same cell with the same food left shares it.
+    """
+    tours = problem.heuristicInfo.setdefault('foodTours', {})
+    key = (position, foodGrid.bits)
+    if key in tours:
+        return tours[key][0]
+    best = (None, None)
+    if foodGrid.count() == 0:
+        best = (0, None)
+    for food in foodGrid.asList():
+        step = foodDistanceField(problem, food).get(position)
+        if step is None:
+            continue
+        rest = foodTourCost(problem, food, foodGrid.eat(*food))
+        if rest is not None and (best[0] is None or step + rest < best[0]):
+            best = (step + rest, food)
+    tours[key] = best
+    return best[0]
+
+def foodTourActions(problem, position, foodGrid):
+    "Returns the actions of the walk whose length foodTourCost gives"
+    if foodTourCost(problem, position, foodGrid) is None:
+        return None
+    tours = problem.heuristicInfo['foodTours']
+    actions = []
+    while foodGrid.count() > 0:
+        food = tours[(position, foodGrid.bits)][1]
+        field = foodDistanceField(problem, food)
+        # Walk downhill in the food's distance field
+        while position != food:
+            x, y = position
+            for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+                dx, dy = Actions.directionToVector(action)
+                nextPos = (int(x + dx), int(y + dy))
+                if field.get(nextPos) == field[position] - 1:
+                    break
+            actions.append(action)
+            position = nextPos
+        foodGrid = foodGrid.eat(*food)
+    return actions
+
+class FoodEndgameProblem(search.SearchProblem):
+    """
+    A FoodSearchProblem in which every state with at most threshold food
+    left has a single move, 'Tour', to a finished state (position, food,
+    'Tour') costing foodTourCost.  A* on it is still optimal, since that is
+    the exact cost of finishing, and it never searches below the threshold.
+    """
+
+    def __init__(self, problem, threshold=FOOD_TOUR_THRESHOLD):
+        self.problem = problem
+        self.threshold = threshold
+
+    def getStartState(self):
+        return self.problem.getStartState()
+
+    def isGoalState(self, state):
+        return len(state) == 3 or self.problem.isGoalState(state)
+
+    def getSuccessors(self, state):
+        position, foodGrid = state
+        if foodGrid.count() > self.threshold:
+            return self.problem.getSuccessors(state)
+        self.problem._expanded += 1
+        cost = foodTourCost(self.problem, position, foodGrid)
+        if cost is None:
+            return []
+        return [((position, foodGrid, 'Tour'), 'Tour', cost)]
+
+    def expandPath(self, path):
+        "Replaces the 'Tour' move at the end of path with the walk it stands for"
+        if not path or path[-1] != 'Tour':
+            return path
+        position, foodGrid = self.problem.getStartState()
+        for action in path[:-1]:
+            dx, dy = Actions.directionToVector(action)
+            position = (int(position[0] + dx), int(position[1] + dy))
+            foodGrid = foodGrid.eat(*position)
+        return path[:-1] + foodTourActions(self.problem, position, foodGrid)
+
+def endgameFoodSearch(problem, heuristic=None, threshold=FOOD_TOUR_THRESHOLD, stats=None):
+    """
+    Solves a FoodSearchProblem with A* until at most threshold food is left,
+    then finishes exactly with Held-Karp (see FoodEndgameProblem).  The
+    heuristic defaults to foodHeuristic.
+    """
+    if heuristic is None:
+        heuristic = foodHeuristic
+    endgame = FoodEndgameProblem(problem, threshold)
+    def endgameHeuristic(state, p=None):
+        if len(state) == 3:
+            return 0
+        return heuristic(state, problem)
+    if stats is None:
+        stats = search.SearchStats()
+    if problem.isGoalState(problem.getStartState()):
+        stats.start('endgameFoodSearch')
+        return stats.finish([])
+    path = endgame.expandPath(search.aStarSearch(endgame, endgameHeuristic, stats))
+    stats.algorithm = 'endgameFoodSearch'
+    stats.pathLength = len(path)
+    return path
 
 class ClosestDotSearchAgent(SearchAgent):
     "Search for all food using a sequence of searches"
@@ -647,6 +878,8 @@ class ClosestDotSearchAgent(SearchAgent):
         currentState = state
         while(currentState.getFood().count() > 0):
             nextPathSegment = self.findPathToClosestDot(currentState) # The missing piece
+            if nextPathSegment is None:
+                raise Exception, 'No food is reachable from here:\n%s' % currentState
             self.actions += nextPathSegment
             for action in nextPathSegment:
                 legal = currentState.getLegalActions()
@@ -660,16 +893,36 @@ class ClosestDotSearchAgent(SearchAgent):
     def findPathToClosestDot(self, gameState):
         """
         Returns a path (a list of actions) to the closest dot, starting from
-        gameState.
+        gameState, or None if every dot left is walled off from Pacman.
+
+        The distances to the nearest dot are kept between calls in a
+        mazeGraph.NearestGoalField, so each call only repairs the cells
+        around the dots eaten since the last one instead of searching again.
         """
         # Here are some useful elements of the startState
         startPosition = gameState.getPacmanPosition()
         food = gameState.getFood()
         walls = gameState.getWalls()
-        problem = AnyFoodSearchProblem(gameState)
 
-        "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+        field = getattr(self, 'nearestFood', None)
+        if field is None or not field.walls == walls:
+            field = self.nearestFood = mazeGraph.NearestGoalField(walls, food.asList())
+        elif food.count() != len(field.goals):
+            # Usually just the dot the last path led to has been eaten
+            lastDot = getattr(self, 'lastDot', None)
+            if food.count() == len(field.goals) - 1 and lastDot in field.goals and not food[lastDot[0]][lastDot[1]]:
+                field.removeGoal(lastDot)
+            else:
+                foodList = food.asList()
+                if [dot for dot in foodList if dot not in field.goals]:
+                    field = self.nearestFood = mazeGraph.NearestGoalField(walls, foodList)
+                else:
+                    for dot in field.goals - set(foodList):
+                        field.removeGoal(dot)
+        path = field.pathFrom(startPosition)
+        if path is not None:
+            self.lastDot = field.goalFrom(startPosition)
+        return path
 
 class AnyFoodSearchProblem(PositionSearchProblem):
     """
@@ -694,20 +947,25 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         # Store info for the PositionSearchProblem (no need to change this)
         self.walls = gameState.getWalls()
         self.startState = gameState.getPacmanPosition()
-        self.costFn = lambda x: 1
+        self.costFn = unitCost
         self._visited, self._visitedlist, self._expanded = {}, [], 0 # DO NOT CHANGE
 
+    def getGoalState(self):
+        "There is no single goal state: any food will do."
+        return None
+
     def isGoalState(self, state):
         """
         The state is Pacman's position. Fill this in with a goal test that will
         complete the problem definition.
         """
         x,y = state
+        return self.food[x][y]
 
-        "*** YOUR CODE HERE ***"
-        util.raiseNotDefined()
+    def getKeyPositions(self):
+        return [self.startState] + self.food.asList()
 
-def mazeDistance(point1, point2, gameState):
+def mazeDistance(point1, point2, gameState, searchFunction=search.bidirectionalSearch):
     """
     Returns the maze distance between any two points, using the search functions
     you have already built. The gameState can be any game state -- Pacman's
@@ -715,6 +973,10 @@ def mazeDistance(point1, point2, gameState):
 
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
+    On very large mazes, searchFunction=search.hierarchicalSearch is much
+    faster but may overestimate the distance slightly.  To find many distances
+    from one point, use mazeDistances instead.
+
     This might be a useful helper function for your ApproximateSearchAgent.
     """
     x1, y1 = point1
@@ -723,4 +985,20 @@ def mazeDistance(point1, point2, gameState):
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
     prob = PositionSearchProblem(gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    return len(searchFunction(prob))
+
+def mazeDistances(source, targets, gameState):
+    """
+    Returns a list of the maze distances from source to each position in
+    targets, with None for targets that cannot be reached.
+
+    All the targets are answered by a single breadth-first search, whose
+    tree is cached per layout (see mazeGraph.ShortestPathTrees): later calls
+    from the same source, or between points along a path already found, do
+    not search again.
+
+    Example usage: mazeDistances( (2,4), [(5,6), (1,1)], gameState)
+    """
+    walls = gameState.getWalls()
+    assert not walls[source[0]][source[1]], 'source is a wall: ' + str(source)
+    return mazeGraph.getShortestPathTrees(walls).distances(source, targets)
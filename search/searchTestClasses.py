@@ -12,6 +12,7 @@
 # Pieter Abbeel (pabbeel@cs.berkeley.edu).
 
 
+import random
 import re
 import testClasses
 import textwrap
@@ -945,3 +946,488 @@ class CornerHeuristicPacman(testClasses.TestCase):
         self.testDict['layout'] = invertLayout(self.testDict['layout'])
         self.layout_text = self.testDict['layout']
     # END SOLUTION NO PROMPT
+
+
+class PriorityQueueTest(testClasses.TestCase):
+    """
+    Runs a script of calls against each of the priority queues in util.py
+    named by the queues field, and compares what every queue reports with
+    the solution.  Each line of the operations field is one call:
+
+      push ITEM PRIORITY, update ITEM PRIORITY, decrease ITEM PRIORITY,
+      remove ITEM, pop, peek, len
+
+    pop and peek report ITEM:PRIORITY, decrease reports whether the priority
+    was lowered, and len reports the number of queued items.  Priorities
+    with a decimal point are read as floats.
+    """
+
+    def __init__(self, question, testDict):
+        super(PriorityQueueTest, self).__init__(question, testDict)
+        self.queueClassNames = testDict['queues'].split()
+        self.operations = [line.split() for line in testDict['operations'].split('\n') if line.strip()]
+
+    def runOperations(self, util, queueClassName):
+        queue = getattr(util, queueClassName)()
+        output = []
+        for operation in self.operations:
+            name, args = operation[0], operation[1:]
+            if len(args) == 2:
+                if '.' in args[1]:
+                    args[1] = float(args[1])
+                else:
+                    args[1] = int(args[1])
+            if name in ('pop', 'peek'):
+                if name == 'pop':
+                    item, priority = queue.popWithPriority()
+                else:
+                    item, priority = queue.peek()
+                output.append('%s:%s' % (item, priority))
+            elif name == 'len':
+                output.append(str(len(queue)))
+            elif name == 'decrease':
+                output.append(str(queue.decreaseKey(*args)))
+            else:
+                getattr(queue, name)(*args)
+        return output
+
+    def execute(self, grades, moduleDict, solutionDict):
+        util = moduleDict['search'].util
+        gold = solutionDict['output'].split()
+        passed = True
+        for queueClassName in self.queueClassNames:
+            try:
+                output = self.runOperations(util, queueClassName)
+            except Exception, e:
+                grades.addMessage('FAIL: %s' % self.path)
+                grades.addMessage('\t%s raised %s: %s' % (queueClassName, type(e).__name__, e))
+                passed = False
+                continue
+            if output != gold:
+                grades.addMessage('FAIL: %s' % self.path)
+                grades.addMessage('\tqueue:\t\t%s' % queueClassName)
+                grades.addMessage('\toutput:\t\t%s' % ' '.join(output))
+                grades.addMessage('\tcorrect output:\t%s' % ' '.join(gold))
+                passed = False
+        if passed:
+            grades.addMessage('PASS: %s' % self.path)
+            grades.addMessage('\tqueues:\t%s' % ' '.join(self.queueClassNames))
+            grades.addMessage('\toutput:\t%s' % ' '.join(gold))
+        return passed
+
+    def writeSolution(self, moduleDict, filePath):
+        output = self.runOperations(moduleDict['search'].util, self.queueClassNames[0])
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        handle.write('output: "%s"\n' % ' '.join(output))
+        handle.close()
+        return True
+
+    # BEGIN SOLUTION NO PROMPT
+    def createPublicVersion(self):
+        pass
+    # END SOLUTION NO PROMPT
+
+class FoodBitboardTest(testClasses.TestCase):
+    """
+    Checks that a FoodBitboard built from a layout's food answers every query
+    the same way as the Grid it was packed from, and that eating the food in
+    two different orders passes through equal bitboards with equal hashes.
+    """
+
+    def __init__(self, question, testDict):
+        super(FoodBitboardTest, self).__init__(question, testDict)
+        self.layoutText = testDict['layout']
+        self.layoutName = testDict['layoutName']
+
+    def checkAgainstGrid(self, board, grid):
+        errors = []
+        if board.asList() != grid.asList():
+            errors.append('asList() is %s, expected %s' % (board.asList(), grid.asList()))
+        if board.asList(False) != grid.asList(False):
+            errors.append('asList(False) does not match the grid')
+        if board.count() != grid.count() or board.count(False) != grid.count(False):
+            errors.append('count() is %d/%d, expected %d/%d' % (board.count(), board.count(False),
+                                                                grid.count(), grid.count(False)))
+        if str(board) != str(grid):
+            errors.append('str() is\n%s\nexpected\n%s' % (board, grid))
+        for x in range(grid.width):
+            column = [bool(food) for food in grid[x]]
+            if board[x] != column:
+                errors.append('column %d is %s, expected %s' % (x, board[x], column))
+            for y in range(grid.height):
+                if board.hasFood(x, y) != grid[x][y]:
+                    errors.append('hasFood(%d, %d) is %s' % (x, y, board.hasFood(x, y)))
+        return errors
+
+    def eatAll(self, searchAgents, grid, order):
+        "Eats the food in the given order, returning the errors and the boards seen"
+        board = searchAgents.FoodBitboard.fromGrid(grid)
+        grid = grid.copy()
+        errors = []
+        boards = [board]
+        for x, y in order:
+            eaten = board.eat(x, y)
+            if eaten.count() != board.count() - 1:
+                errors.append('eat(%d, %d) left %d food out of %d' % (x, y, eaten.count(), board.count()))
+            if not board.hasFood(x, y):
+                errors.append('eat(%d, %d) changed the bitboard it was called on' % (x, y))
+            if eaten.eat(x, y) is not eaten:
+                errors.append('eating the empty cell (%d, %d) made a new bitboard' % (x, y))
+            grid[x][y] = False
+            errors.extend(self.checkAgainstGrid(eaten, grid))
+            board = eaten
+            boards.append(board)
+        return errors, boards
+
+    def execute(self, grades, moduleDict, solutionDict):
+        searchAgents = moduleDict['searchAgents']
+        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
+        grid = lay.food
+        foodList = grid.asList()
+
+        errors = self.checkAgainstGrid(searchAgents.FoodBitboard.fromGrid(grid), grid)
+        forwardErrors, forward = self.eatAll(searchAgents, grid, foodList)
+        backwardErrors, backward = self.eatAll(searchAgents, grid, list(reversed(foodList)))
+        errors.extend(forwardErrors)
+        errors.extend(backwardErrors)
+        # Eating everything but the first and last dot, from either end,
+        # leaves the same food behind.
+        if len(foodList) > 1:
+            pairs = [(forward[0], backward[0]), (forward[-1], backward[-1])]
+            middle = searchAgents.FoodBitboard.fromGrid(grid)
+            for food in foodList[1:-1]:
+                middle = middle.eat(*food)
+            backwardMiddle = searchAgents.FoodBitboard.fromGrid(grid)
+            for food in reversed(foodList[1:-1]):
+                backwardMiddle = backwardMiddle.eat(*food)
+            pairs.append((middle, backwardMiddle))
+            for first, second in pairs:
+                if first != second or hash(first) != hash(second):
+                    errors.append('bitboards with the same food are not equal:\n%s\n\n%s' % (first, second))
+            if forward[1] == forward[0]:
+                errors.append('bitboards with different food are equal')
+
+        if errors:
+            grades.addMessage('FAIL: %s' % self.path)
+            for error in errors:
+                grades.addMessage('\t%s' % error)
+            return False
+        grades.addMessage('PASS: %s' % self.path)
+        grades.addMessage('\tfood checked:\t%d' % len(foodList))
+        return True
+
+    def writeSolution(self, moduleDict, filePath):
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        handle.write('# File intentionally blank.\n')
+        handle.close()
+        return True
+
+    # BEGIN SOLUTION NO PROMPT
+    def createPublicVersion(self):
+        pass
+    # END SOLUTION NO PROMPT
+
+class FoodSpanningTreeTest(testClasses.TestCase):
+    """
+    Checks foodSpanningTreeCost against a spanning tree computed here from
+    scratch, for the food left after each dot is eaten and for a few random
+    subsets of the food drawn with a fixed seed.  The subsets are run against
+    a cold cache, again against the warm cache, and once more with the cache
+    capped at cacheSize entries, which must never be exceeded.
+    """
+
+    def __init__(self, question, testDict):
+        super(FoodSpanningTreeTest, self).__init__(question, testDict)
+        self.layoutText = testDict['layout']
+        self.layoutName = testDict['layoutName']
+        self.cacheSize = int(testDict['cacheSize'])
+        self.randomSubsets = int(testDict['randomSubsets'])
+        self.seed = int(testDict['seed'])
+
+    def mazeDistances(self, walls, source):
+        distances = {source: 0}
+        frontier = [source]
+        for x, y in frontier:
+            for neighbor in [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]:
+                if neighbor not in distances and not walls[neighbor[0]][neighbor[1]]:
+                    distances[neighbor] = distances[(x, y)] + 1
+                    frontier.append(neighbor)
+        return distances
+
+    def spanningTreeCost(self, walls, foodList):
+        "Kruskal's algorithm with a union-find over the food cells"
+        edges = []
+        for i, food in enumerate(foodList):
+            distances = self.mazeDistances(walls, food)
+            for other in foodList[i + 1:]:
+                edges.append((distances[other], food, other))
+        edges.sort()
+        parent = dict([(food, food) for food in foodList])
+        def find(food):
+            while parent[food] != food:
+                food = parent[food]
+            return food
+        cost = 0
+        for distance, food, other in edges:
+            root, otherRoot = find(food), find(other)
+            if root != otherRoot:
+                parent[root] = otherRoot
+                cost += distance
+        return cost
+
+    def foodSubsets(self, searchAgents, grid):
+        board = searchAgents.FoodBitboard.fromGrid(grid)
+        foodList = board.asList()
+        subsets = []
+        for food in foodList[:-1]:
+            subsets.append(board)
+            board = board.eat(*food)
+        rand = random.Random(self.seed)
+        for _ in range(self.randomSubsets):
+            board = searchAgents.FoodBitboard.fromGrid(grid)
+            for food in rand.sample(foodList, rand.randint(0, len(foodList) - 1)):
+                board = board.eat(*food)
+            subsets.append(board)
+        return subsets
+
+    def execute(self, grades, moduleDict, solutionDict):
+        searchAgents = moduleDict['searchAgents']
+        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
+        gameState = pacman.GameState()
+        gameState.initialize(lay, 0)
+        problem = searchAgents.FoodSearchProblem(gameState)
+        subsets = self.foodSubsets(searchAgents, lay.food)
+        gold = [self.spanningTreeCost(problem.walls, board.asList()) for board in subsets]
+
+        errors = []
+        def check(label, problem):
+            for board, cost in zip(subsets, gold):
+                found = searchAgents.foodSpanningTreeCost(problem, board)
+                if found != cost:
+                    errors.append('%s cache: cost %s for food %s, expected %s' % (label, found, board.asList(), cost))
+                cache = problem.heuristicInfo.get('foodMST', ())
+                if len(cache) > searchAgents.FOOD_MST_CACHE_SIZE:
+                    errors.append('%s cache: holds %d entries, more than the limit of %d'
+                                  % (label, len(cache), searchAgents.FOOD_MST_CACHE_SIZE))
+        check('cold', problem)
+        check('warm', problem)
+        cacheSize = searchAgents.FOOD_MST_CACHE_SIZE
+        searchAgents.FOOD_MST_CACHE_SIZE = self.cacheSize
+        try:
+            check('capped', searchAgents.FoodSearchProblem(gameState))
+        finally:
+            searchAgents.FOOD_MST_CACHE_SIZE = cacheSize
+
+        if errors:
+            grades.addMessage('FAIL: %s' % self.path)
+            for error in errors:
+                grades.addMessage('\t%s' % error)
+            return False
+        grades.addMessage('PASS: %s' % self.path)
+        grades.addMessage('\tfood subsets checked:\t%d' % len(subsets))
+        return True
+
+    def writeSolution(self, moduleDict, filePath):
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        handle.write('# File intentionally blank.\n')
+        handle.close()
+        return True
+
+    # BEGIN SOLUTION NO PROMPT
+    def createPublicVersion(self):
+        pass
+    # END SOLUTION NO PROMPT
+
+class ClosestDotAgentTest(testClasses.TestCase):
+    """
+    Runs ClosestDotSearchAgent over a whole layout.  When every dot can be
+    reached the agent must eat them all with a path of solution_length
+    moves; when some dot is walled off from Pacman (unreachable: "True") it
+    must raise an error rather than plan forever.
+    """
+
+    def __init__(self, question, testDict):
+        super(ClosestDotAgentTest, self).__init__(question, testDict)
+        self.layoutText = testDict['layout']
+        self.layoutName = testDict['layoutName']
+        self.unreachable = testDict.get('unreachable', 'False') == 'True'
+
+    def solution(self, searchAgents):
+        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
+        gameState = pacman.GameState()
+        gameState.initialize(lay, 0)
+        agent = searchAgents.ClosestDotSearchAgent()
+        agent.registerInitialState(gameState)
+        return agent.actions
+
+    def execute(self, grades, moduleDict, solutionDict):
+        searchAgents = moduleDict['searchAgents']
+        try:
+            path = self.solution(searchAgents)
+        except Exception, e:
+            if self.unreachable:
+                grades.addMessage('PASS: %s' % self.path)
+                grades.addMessage('\tpacman layout:\t\t%s' % self.layoutName)
+                grades.addMessage('\traised:\t\t%s' % str(e).split('\n')[0])
+                return True
+            grades.addMessage('FAIL: %s' % self.path)
+            grades.addMessage('\traised %s: %s' % (type(e).__name__, e))
+            return False
+
+        if self.unreachable:
+            grades.addMessage('FAIL: %s' % self.path)
+            grades.addMessage('\tA dot is walled off, but a path of length %d was returned.' % len(path))
+            return False
+        gold_length = int(solutionDict['solution_length'])
+        if len(path) != gold_length:
+            grades.addMessage('FAIL: %s' % self.path)
+            grades.addMessage('\tsolution length:\t\t%s' % len(path))
+            grades.addMessage('\tcorrect solution length:\t%s' % gold_length)
+            return False
+        grades.addMessage('PASS: %s' % self.path)
+        grades.addMessage('\tpacman layout:\t\t%s' % self.layoutName)
+        grades.addMessage('\tsolution length:\t\t%s' % len(path))
+        return True
+
+    def writeSolution(self, moduleDict, filePath):
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        if self.unreachable:
+            handle.write('# File intentionally blank.\n')
+        else:
+            handle.write('solution_length: "%s"\n' % len(self.solution(moduleDict['searchAgents'])))
+        handle.close()
+        return True
+
+    # BEGIN SOLUTION NO PROMPT
+    def createPublicVersion(self):
+        pass
+    # END SOLUTION NO PROMPT
+
+class WeightedPositionSearchTest(testClasses.TestCase):
+    """
+    Runs a search function on the weighted PositionSearchProblem of an agent
+    such as StayEastSearchAgent, whose step costs are not all 1, and checks
+    that the path reaches the goal at the same cost as uniformCostSearch.
+    """
+
+    def __init__(self, question, testDict):
+        super(WeightedPositionSearchTest, self).__init__(question, testDict)
+        self.layoutText = testDict['layout']
+        self.layoutName = testDict['layoutName']
+        self.algorithm = testDict['algorithm']
+        self.agentName = testDict['agent']
+
+    def makeProblem(self, searchAgents):
+        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
+        gameState = pacman.GameState()
+        gameState.initialize(lay, 0)
+        agent = getattr(searchAgents, self.agentName)()
+        return agent.searchType(gameState)
+
+    def execute(self, grades, moduleDict, solutionDict):
+        search = moduleDict['search']
+        searchAgents = moduleDict['searchAgents']
+        problem = self.makeProblem(searchAgents)
+        path = getattr(search, self.algorithm)(problem)
+        goldPath = search.uniformCostSearch(self.makeProblem(searchAgents))
+        cost = problem.getCostOfActions(path)
+        goldCost = problem.getCostOfActions(goldPath)
+
+        if not checkSolution(problem, path):
+            grades.addMessage('FAIL: %s' % self.path)
+            grades.addMessage('\tReturned path is not a solution.')
+            grades.addMessage('\tpath returned by %s: %s' % (self.algorithm, path))
+            return False
+        if cost != goldCost:
+            grades.addMessage('FAIL: %s' % self.path)
+            grades.addMessage('\t%s costs with %s:\t%s' % (self.algorithm, self.agentName, cost))
+            grades.addMessage('\tuniformCostSearch cost:\t%s' % goldCost)
+            return False
+        grades.addMessage('PASS: %s' % self.path)
+        grades.addMessage('\tpacman layout:\t\t%s' % self.layoutName)
+        grades.addMessage('\tsolution cost:\t\t%s' % cost)
+        return True
+
+    def writeSolution(self, moduleDict, filePath):
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        handle.write('# File intentionally blank.\n')
+        handle.close()
+        return True
+
+    # BEGIN SOLUTION NO PROMPT
+    def createPublicVersion(self):
+        pass
+    # END SOLUTION NO PROMPT
+
+class MazeGraphTest(testClasses.TestCase):
+    """
+    Builds the MazeGraph of a layout's walls and checks every edge: walking
+    its actions from the node must enter exactly its cells, pass no other
+    node and end at a different node, which has an edge of the same length
+    back.  The numbers of nodes and edges are compared with the solution.
+    """
+
+    def __init__(self, question, testDict):
+        super(MazeGraphTest, self).__init__(question, testDict)
+        self.layoutText = testDict['layout']
+        self.layoutName = testDict['layoutName']
+
+    def buildGraph(self, mazeGraph):
+        lay = layout.Layout([l.strip() for l in self.layoutText.split('\n')])
+        return mazeGraph.MazeGraph(lay.walls)
+
+    def checkEdges(self, graph):
+        errors = []
+        for node, edges in graph.edges.items():
+            for endNode, actions, cells in edges:
+                if endNode == node:
+                    errors.append('%s has an edge to itself: %s' % (node, ' '.join(actions)))
+                position = node
+                walked = []
+                for action in actions:
+                    dx, dy = Actions.directionToVector(action)
+                    position = (int(position[0] + dx), int(position[1] + dy))
+                    walked.append(position)
+                if tuple(walked) != cells or walked[-1] != endNode:
+                    errors.append('the edge from %s to %s walks to %s' % (node, endNode, walked))
+                if [cell for cell in walked[:-1] if cell in graph.nodes]:
+                    errors.append('the edge from %s to %s passes another node' % (node, endNode))
+                if len(actions) not in [len(back[1]) for back in graph.edges.get(endNode, []) if back[0] == node]:
+                    errors.append('%s has no edge back to %s of length %d' % (endNode, node, len(actions)))
+        return errors
+
+    def execute(self, grades, moduleDict, solutionDict):
+        graph = self.buildGraph(moduleDict['searchAgents'].mazeGraph)
+        errors = self.checkEdges(graph)
+        counts = '%d %d' % (len(graph.nodes), graph.numEdges())
+        gold = '%s %s' % (solutionDict['nodes'], solutionDict['edges'])
+        if counts != gold:
+            errors.append('nodes and edges: %s, expected %s' % (counts, gold))
+        if errors:
+            grades.addMessage('FAIL: %s' % self.path)
+            for error in errors:
+                grades.addMessage('\t%s' % error)
+            return False
+        grades.addMessage('PASS: %s' % self.path)
+        grades.addMessage('\tpacman layout:\t\t%s' % self.layoutName)
+        grades.addMessage('\tnodes and edges:\t%s' % counts)
+        return True
+
+    def writeSolution(self, moduleDict, filePath):
+        graph = self.buildGraph(moduleDict['searchAgents'].mazeGraph)
+        handle = open(filePath, 'w')
+        handle.write('# This is the solution file for %s.\n' % self.path)
+        handle.write('nodes: "%d"\n' % len(graph.nodes))
+        handle.write('edges: "%d"\n' % graph.numEdges())
+        handle.close()
+        return True
+
+    # BEGIN SOLUTION NO PROMPT
+    def createPublicVersion(self):
+        pass
+    # END SOLUTION NO PROMPT
@@ -112,7 +112,7 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY # Penalty for waiting around
         else:
-            GhostRules.decrementTimer( state.data.agentStates[agentIndex] )
+            GhostRules.decrementTimer( state.data.copyAgentState( agentIndex ) )
 
         # Resolve multi-agent effects
         GhostRules.checkDeath( state, agentIndex )
@@ -325,7 +325,7 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions( state.getPacmanState().configuration, state.data.layout.walls )
+        return state.data.layout.getMoveTable().getPossibleActions( state.getPacmanState().configuration )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action ):
@@ -336,7 +336,7 @@ class PacmanRules:
         if action not in legal:
             raise "Illegal action", action
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.copyAgentState( 0 )
 
         # Update Configuration
         vector = Actions.directionToVector( action, 1)
@@ -350,7 +350,7 @@ class GhostRules:
     """
     def getLegalActions( state, ghostIndex ):
         conf = state.getGhostState( ghostIndex ).configuration
-        return Actions.getPossibleActions( conf, state.data.layout.walls )
+        return state.data.layout.getMoveTable().getPossibleActions( conf )
     getLegalActions = staticmethod( getLegalActions )
 
     def applyAction( state, action, ghostIndex):
@@ -358,7 +358,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action: " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.copyAgentState( ghostIndex )
         vector = Actions.directionToVector( action, 1 )
         ghostState.configuration = ghostState.configuration.generateSuccessor( vector )
     applyAction = staticmethod( applyAction )
@@ -387,8 +387,10 @@ class GhostRules:
 
     def collide( state, ghostState, agentIndex):
         state.data.scoreChange += 200
+        ghostState = state.data.copyAgentState( agentIndex )
         GhostRules.placeGhost(ghostState, agentIndex)
         # Added for first-person
+        state.data._eaten = state.data._eaten[:]
         state.data._eaten[agentIndex] = True
         state.setGhostNotLiving(agentIndex)
     collide = staticmethod( collide )
@@ -84,7 +84,7 @@ class BustersAgent:
     def observationFunction(self, gameState):
         "Removes the ghost states from the gameState"
         agents = gameState.data.agentStates
-        gameState.data.agentStates = [agents[0]] + [None for i in range(1, len(agents))]
+        gameState.data.setAgentStates([agents[0]] + [None for i in range(1, len(agents))])
         return gameState
 
     def getAction(self, gameState):
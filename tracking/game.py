@@ -22,6 +22,9 @@
 
 from util import *
 import time, os
+import copy
+import random
+import string
 import traceback
 import sys
 
@@ -159,13 +162,48 @@ class AgentState:
     def getDirection(self):
         return self.configuration.getDirection()
 
+# Zobrist hashing: every feature a state can have (a food dot in a cell, an
+# agent at a position, ...) gets a random 64 bit key, and a state hashes to
+# the XOR of the keys of its features.  Changing one feature then changes the
+# hash by XORing out the old key and XORing in the new one.
+_ZOBRIST_MASK = (1 << 64) - 1
+_zobristTables = {}
+
+def zobristKeys(feature, count):
+    """
+    A list of at least count random 64 bit keys for one feature of a state,
+    such as ('position', 1) for agent 1's position, indexed by the value of
+    the feature.  The keys are the same on every call and in every run.
+    """
+    table = _zobristTables.get(feature)
+    if table is None:
+        table = _zobristTables[feature] = (random.Random(repr(feature)), [])
+    generator, keys = table
+    while len(keys) < count:
+        keys.append(generator.getrandbits(64))
+    return keys
+
+# Translation tables between Grid cell bytes and the '0'/'1' digits of a bit string
+_CELLS_TO_DIGITS = string.maketrans('\x00\x01', '01')
+_DIGITS_TO_CELLS = string.maketrans('01', '\x00\x01')
+
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.  Data is accessed
-    via grid[x][y] where (x,y) are positions on a Pacman map with x horizontal,
-    y vertical and the origin (0,0) in the bottom left corner.
+    A 2-dimensional array of booleans backed by a list of bytearray columns,
+    one byte per cell.  Data is accessed via grid[x][y] where (x,y) are
+    positions on a Pacman map with x horizontal, y vertical and the origin
+    (0,0) in the bottom left corner.  Cells read back as 1 or 0, which
+    compare equal to True and False.
+
+    Because the columns are bytearrays, copying, comparing, counting and
+    listing the true cells run column by column in C rather than cell by
+    cell in Python.
 
     The __str__ method constructs an output that is oriented like a pacman board.
+
+    A grid's hash is read from its cells on every call, in one pass in C,
+    so it stays right when grid[x][y] is written in place.  zobristHash is
+    the cheaper hash that game states use for their food: see its comment.
     """
     def __init__(self, width, height, initialValue=False, bitRepresentation=None):
         if initialValue not in [False, True]: raise Exception('Grids can only contain booleans')
@@ -173,7 +211,10 @@ class Grid:
 
         self.width = width
         self.height = height
-        self.data = [[initialValue for y in range(height)] for x in range(width)]
+        column = bytearray([initialValue]) * height
+        self.data = [column[:] for x in range(width)]
+        self._zobrist = None
+        self._contentKey = None   # kept once the grid is frozen
         if bitRepresentation:
             self._unpackBits(bitRepresentation)
 
@@ -181,49 +222,104 @@ class Grid:
         return self.data[i]
 
     def __setitem__(self, key, item):
-        self.data[key] = item
+        self.data[key] = bytearray(item)
+        self._zobrist = None
+        self._contentKey = None
 
     def __str__(self):
-        out = [[str(self.data[x][y])[0] for x in range(self.width)] for y in range(self.height)]
+        out = [''.join(['FT'[column[y]] for column in self.data]) for y in range(self.height)]
         out.reverse()
-        return '\n'.join([''.join(x) for x in out])
+        return '\n'.join(out)
 
     def __eq__(self, other):
         if other == None: return False
+        if self.data is other.data: return True
         return self.data == other.data
 
     def __hash__(self):
-        # return hash(str(self))
-        base = 1
-        h = 0
-        for l in self.data:
-            for i in l:
-                if i:
-                    h += base
-                base *= 2
-        return hash(h)
+        return hash(str(bytearray().join(self.data)))
+
+    def zobristHash(self):
+        """
+        The XOR of the Zobrist keys of the true cells.  It is worked out once
+        and then kept, and copyWithValue updates it with one XOR, so it is
+        only for grids that are replaced rather than written in place once
+        it has been read, such as the food of a game state.
+        """
+        if self._zobrist is None:
+            keys = zobristKeys('cell', self.width * self.height)
+            h = 0
+            for x in range(self.width):
+                column = self.data[x]
+                base = x * self.height
+                y = column.find('\x01')
+                while y != -1:
+                    h ^= keys[base + y]
+                    y = column.find('\x01', y + 1)
+            self._zobrist = h
+        return self._zobrist
 
     def copy(self):
-        g = Grid(self.width, self.height)
+        g = copy.copy(self)
         g.data = [x[:] for x in self.data]
+        g._zobrist = None
+        g._contentKey = None
+        return g
+
+    def freeze(self):
+        """
+        Promises that the grid will not change again, as the walls of a
+        shared Layout never do, so that contentKey is read only once.
+        Copies of the grid are not frozen.
+        """
+        self._contentKey = None
+        self._contentKey = self.contentKey()
+
+    def contentKey(self):
+        """
+        A hashable key that two grids share exactly when their contents are
+        equal.  A frozen grid keeps its key; any other grid reads its cells
+        on every call, so one changed in place gets a new key.
+        """
+        if self._contentKey is not None:
+            return self._contentKey
+        return (self.width, self.height, str(bytearray().join(self.data)))
+
+    def copyWithValue(self, x, y, value):
+        """
+        Returns a copy of the grid with (x, y) set to value.  Only column x is
+        copied, the other columns are shared with this grid, so neither grid
+        may be changed in place afterwards.
+        """
+        g = copy.copy(self)
+        g.data = self.data[:]
+        g.data[x] = self.data[x][:]
+        g._contentKey = None
+        if g._zobrist is not None and bool(value) != bool(self.data[x][y]):
+            g._zobrist ^= zobristKeys('cell', self.width * self.height)[x * self.height + y]
+        g.data[x][y] = value
         return g
 
     def deepCopy(self):
         return self.copy()
 
     def shallowCopy(self):
-        g = Grid(self.width, self.height)
-        g.data = self.data
-        return g
+        # copy.copy shares self.data without building a new grid first
+        return copy.copy(self)
 
     def count(self, item =True ):
-        return sum([x.count(item) for x in self.data])
+        cell = item and '\x01' or '\x00'
+        return sum([column.count(cell) for column in self.data])
 
     def asList(self, key = True):
+        cell = key and '\x01' or '\x00'
         list = []
         for x in range(self.width):
-            for y in range(self.height):
-                if self[x][y] == key: list.append( (x,y) )
+            column = self.data[x]
+            y = column.find(cell)
+            while y != -1:
+                list.append( (x,y) )
+                y = column.find(cell, y + 1)
         return list
 
     def packBits(self):
@@ -232,17 +328,12 @@ class Grid:
 
         (width, height, bitPackedInts...)
         """
+        digits = str(bytearray().join(self.data)).translate(_CELLS_TO_DIGITS)
         bits = [self.width, self.height]
-        currentInt = 0
-        for i in range(self.height * self.width):
-            bit = self.CELLS_PER_INT - (i % self.CELLS_PER_INT) - 1
-            x, y = self._cellIndexToPosition(i)
-            if self[x][y]:
-                currentInt += 2 ** bit
-            if (i + 1) % self.CELLS_PER_INT == 0:
-                bits.append(currentInt)
-                currentInt = 0
-        bits.append(currentInt)
+        for start in range(0, len(digits), self.CELLS_PER_INT):
+            bits.append(int(digits[start:start + self.CELLS_PER_INT].ljust(self.CELLS_PER_INT, '0'), 2))
+        if len(digits) % self.CELLS_PER_INT == 0:
+            bits.append(0)
         return tuple(bits)
 
     def _cellIndexToPosition(self, index):
@@ -254,25 +345,13 @@ class Grid:
         """
         Fills in data from a bit-level representation
         """
-        cell = 0
         for packed in bits:
-            for bit in self._unpackInt(packed, self.CELLS_PER_INT):
-                if cell == self.width * self.height: break
-                x, y = self._cellIndexToPosition(cell)
-                self[x][y] = bit
-                cell += 1
-
-    def _unpackInt(self, packed, size):
-        bools = []
-        if packed < 0: raise ValueError, "must be a positive integer"
-        for i in range(size):
-            n = 2 ** (self.CELLS_PER_INT - i - 1)
-            if packed >= n:
-                bools.append(True)
-                packed -= n
-            else:
-                bools.append(False)
-        return bools
+            if packed < 0: raise ValueError, "must be a positive integer"
+        digits = ''.join([bin(packed)[2:].zfill(self.CELLS_PER_INT) for packed in bits])
+        cells = bytearray(digits[:self.width * self.height].translate(_DIGITS_TO_CELLS))
+        for x in range(self.width):
+            column = cells[x * self.height:(x + 1) * self.height]
+            self.data[x][:len(column)] = column
 
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
@@ -368,22 +447,106 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
-class GameStateData:
+class MoveTable:
+    """
+    The legal moves out of every cell of a walls grid, worked out once.
+
+    Cells are numbered x * height + y.  For each cell, masks holds a bitmask
+    of the open directions (bit i for Actions._directionsAsList[i]) and
+    neighbors the cell numbers they lead to, in the same order.  Only cells
+    whose four neighbors all lie inside the grid are compiled; positions
+    elsewhere, and the in-between positions of scared ghosts, fall back to
+    Actions, so answers always match it.  A table made with compiled=False
+    compiles no cells and answers everything through Actions, for walls that
+    may still change.
     """
+    # The actions open under each direction bitmask
+    _maskActions = [tuple([dir for i, (dir, vec) in enumerate(Actions._directionsAsList) if mask >> i & 1])
+                    for mask in range(1 << len(Actions._directionsAsList))]
+
+    def __init__(self, walls, compiled=True):
+        self.walls = walls
+        self.cells = {}
+        if not compiled:
+            self.positions, self.masks, self.neighbors = [], bytearray(), []
+            return
+        height = walls.height
+        self.positions = [(x, y) for x in range(walls.width) for y in range(height)]
+        self.masks = bytearray(len(self.positions))
+        self.neighbors = [()] * len(self.positions)
+        for x in range(1, walls.width - 1):
+            for y in range(1, height - 1):
+                cell = x * height + y
+                mask, neighbors = 0, []
+                for i, (dir, (dx, dy)) in enumerate(Actions._directionsAsList):
+                    if not walls[x + dx][y + dy]:
+                        mask |= 1 << i
+                        neighbors.append(cell + dx * height + dy)
+                self.masks[cell] = mask
+                self.neighbors[cell] = tuple(neighbors)
+                self.cells[(x, y)] = cell
+
+    def getPossibleActions(self, config):
+        "Same as Actions.getPossibleActions(config, walls)"
+        cell = self.cells.get(config.pos)
+        if cell is None:
+            return Actions.getPossibleActions(config, self.walls)
+        return list(MoveTable._maskActions[self.masks[cell]])
+
+    def getLegalNeighbors(self, position):
+        "Same as Actions.getLegalNeighbors(position, walls)"
+        cell = self.cells.get(position)
+        if cell is None:
+            return Actions.getLegalNeighbors(position, self.walls)
+        positions = self.positions
+        return [positions[neighbor] for neighbor in self.neighbors[cell]]
 
+class GameStateData:
+    """
+    The data of a game state.  A successor shares the food grid, capsule
+    list, eaten flags and agent states of its predecessor and replaces only
+    what its move changes: agent states are held in a tuple, and an agent's
+    state is copied into its slot by copyAgentState before it is changed.
+    Rules must replace, never change in place, anything shared this way.
+
+    The data keeps its Zobrist hash along with the parts it was worked out
+    from.  A successor starts from its predecessor's hash, and hashing it
+    XORs in only what its move changed: the agents handed out by
+    copyAgentState or set by setAgentState, the food grid's hash (which
+    copyWithValue keeps up to date), the capsule list if it was replaced, and
+    the score.  So hashing a successor costs O(changes) however big the
+    board is.
     """
+    # The order in which directions index their Zobrist keys
+    _directionIndex = {Directions.NORTH: 0, Directions.SOUTH: 1, Directions.EAST: 2,
+                       Directions.WEST: 3, Directions.STOP: 4}
+    # An odd multiplier that spreads a score's hash over 64 bits
+    _scoreMultiplier = random.Random('score').getrandbits(64) | 1
+
     def __init__( self, prevState = None ):
         """
-        Generates a new data packet by copying information from its predecessor.
+        Generates a new data packet by sharing information with its predecessor.
         """
         if prevState != None:
             self.food = prevState.food.shallowCopy()
-            self.capsules = prevState.capsules[:]
-            self.agentStates = self.copyAgentStates( prevState.agentStates )
+            self.capsules = prevState.capsules
+            self.agentStates = prevState.agentStates
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._hash = prevState._hash
+            self._hashedFood = prevState._hashedFood
+            self._hashedCapsules = prevState._hashedCapsules
+            self._hashedScore = prevState._hashedScore
+            self._agentKeys = prevState._agentKeys
+            self._dirtyAgents = prevState._dirtyAgents
+        else:
+            self._hash = None   # None until the data is first hashed
+            self._hashedFood = self._hashedCapsules = self._hashedScore = None
+            self._agentKeys = ()
+            self._dirtyAgents = 0
 
+        self._ownedAgents = 0   # bit i is set once agentStates[i] is private to this data
         self._foodEaten = None
         self._foodAdded = None
         self._capsuleEaten = None
@@ -395,6 +558,10 @@ class GameStateData:
     def deepCopy( self ):
         state = GameStateData( self )
         state.food = self.food.deepCopy()
+        state.capsules = self.capsules[:]
+        state.setAgentStates( self.copyAgentStates( self.agentStates ) )
+        state._eaten = self._eaten[:]
+        # The layout is immutable, so the copy shares it rather than re-parsing it
         state.layout = self.layout.deepCopy()
         state._agentMoved = self._agentMoved
         state._foodEaten = self._foodEaten
@@ -408,12 +575,38 @@ class GameStateData:
             copiedStates.append( agentState.copy() )
         return copiedStates
 
+    def setAgentStates( self, agentStates ):
+        "Replaces all the agent states with ones owned by this data"
+        self.agentStates = tuple( agentStates )
+        self._ownedAgents = (1 << len( self.agentStates )) - 1
+        self._hash = None
+
+    def setAgentState( self, index, agentState ):
+        "Puts agentState in slot index, leaving the other slots shared"
+        agentStates = list( self.agentStates )
+        agentStates[index] = agentState
+        self.agentStates = tuple( agentStates )
+        self._ownedAgents |= 1 << index
+        self._dirtyAgents |= 1 << index
+
+    def copyAgentState( self, index ):
+        """
+        Returns agent index's state for changing, first replacing it with a
+        copy if it is still shared with another state.
+        """
+        if not self._ownedAgents & (1 << index):
+            self.setAgentState( index, self.agentStates[index].copy() )
+        # The caller may change it, so its hash key is read again when needed
+        self._dirtyAgents |= 1 << index
+        return self.agentStates[index]
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
         """
         if other == None: return False
         # TODO Check for type of other
+        if hash( self ) != hash( other ): return False
         if not self.agentStates == other.agentStates: return False
         if not self.food == other.food: return False
         if not self.capsules == other.capsules: return False
@@ -422,25 +615,78 @@ class GameStateData:
 
     def __hash__( self ):
         """
-        Allows states to be keys of dictionaries.
+        Allows states to be keys of dictionaries.  The hash is the Zobrist
+        hash of the agents' positions, directions and scared timers, the
+        food, the capsules and the score, brought up to date from the parts
+        that changed since it was last read.
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError, e:
-                print e
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        if self._hash is None:
+            self._hashedFood = self.food.zobristHash()
+            self._hashedCapsules = self.capsules
+            self._hashedScore = self.score
+            self._agentKeys = tuple( [self._agentKey( index ) for index in range( len( self.agentStates ) )] )
+            self._dirtyAgents = 0
+            h = self._hashedFood ^ self._capsuleKey( self.capsules ) ^ self._scoreKey( self.score )
+            for key in self._agentKeys:
+                h ^= key
+            self._hash = h
+            return h
+
+        h = self._hash
+        if self._dirtyAgents:
+            agentKeys = list( self._agentKeys )
+            for index in range( len( agentKeys ) ):
+                if self._dirtyAgents & (1 << index):
+                    key = self._agentKey( index )
+                    h ^= agentKeys[index] ^ key
+                    agentKeys[index] = key
+            self._agentKeys = tuple( agentKeys )
+            self._dirtyAgents = 0
+        foodHash = self.food.zobristHash()
+        if foodHash != self._hashedFood:
+            h ^= self._hashedFood ^ foodHash
+            self._hashedFood = foodHash
+        if self.capsules is not self._hashedCapsules:
+            h ^= self._capsuleKey( self._hashedCapsules ) ^ self._capsuleKey( self.capsules )
+            self._hashedCapsules = self.capsules
+        if self.score != self._hashedScore:
+            h ^= self._scoreKey( self._hashedScore ) ^ self._scoreKey( self.score )
+            self._hashedScore = self.score
+        self._hash = h
+        return h
+
+    def _agentKey( self, index ):
+        "The XOR of the Zobrist keys of agent index's position, direction and scared timer"
+        agentState = self.agentStates[index]
+        if agentState is None or agentState.configuration is None: return 0
+        x, y = agentState.configuration.pos
+        # Agents move in half steps at most, so positions index keys on a half-cell lattice
+        cells = 4 * self.layout.width * self.layout.height
+        cell = (int( 2 * x ) * 2 * self.layout.height + int( 2 * y )) % cells
+        direction = GameStateData._directionIndex.get( agentState.configuration.direction, 4 )
+        return zobristKeys( ('position', index), cells )[cell] ^ \
+               zobristKeys( ('direction', index), 5 )[direction] ^ \
+               zobristKeys( ('scaredTimer', index), 64 )[int( agentState.scaredTimer ) % 64]
+
+    def _capsuleKey( self, capsules ):
+        "The XOR of the Zobrist keys of the capsules' cells"
+        height = self.layout.height
+        keys = zobristKeys( 'capsule', self.layout.width * height )
+        h = 0
+        for x, y in capsules:
+            h ^= keys[x * height + y]
+        return h
+
+    def _scoreKey( self, score ):
+        return (hash( score ) * GameStateData._scoreMultiplier) & _ZOBRIST_MASK
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
-        map = Grid(width, height)
         if type(self.food) == type((1,2)):
             self.food = reconstituteGrid(self.food)
-        for x in range(width):
-            for y in range(height):
-                food, walls = self.food, self.layout.walls
-                map[x][y] = self._foodWallStr(food[x][y], walls[x][y])
+        food, walls = self.food, self.layout.walls
+        # Grids only hold booleans, so the characters go in plain columns
+        map = [[self._foodWallStr(food[x][y], walls[x][y]) for y in range(height)] for x in range(width)]
 
         for agentState in self.agentStates:
             if agentState == None: continue
@@ -455,7 +701,9 @@ class GameStateData:
         for x, y in self.capsules:
             map[x][y] = 'o'
 
-        return str(map) + ("\nScore: %d\n" % self.score)
+        out = [''.join([map[x][y] for x in range(width)]) for y in range(height)]
+        out.reverse()
+        return '\n'.join(out) + ("\nScore: %d\n" % self.score)
 
     def _foodWallStr( self, hasFood, hasWall ):
         if hasFood:
@@ -495,13 +743,14 @@ class GameStateData:
         self.score = 0
         self.scoreChange = 0
 
-        self.agentStates = []
+        agentStates = []
         numGhosts = 0
         for isPacman, pos in layout.agentPositions:
             if not isPacman:
                 if numGhosts == numGhostAgents: continue # Max ghosts reached already
                 else: numGhosts += 1
-            self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
+            agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
+        self.setAgentStates( agentStates )
         self._eaten = [False for a in self.agentStates]
 
 try:
@@ -13,18 +13,25 @@
 
 
 from util import manhattanDistance
-from game import Grid
+from game import Grid, MoveTable
 import os
 import random
 
 VISIBILITY_MATRIX_CACHE = {}
+LAYOUT_CACHE = {}
 
 class Layout:
     """
     A Layout manages the static information about the game board.
+
+    Layouts are immutable once built: game states share one by reference
+    rather than copying it, and the same text always gives the same object
+    when loaded through internLayout or getLayout.  Code that needs to
+    change a layout must take a mutableCopy() first and change that.  The
+    walls Grid of a frozen layout is frozen too (see Grid.freeze).
     """
 
-    def __init__(self, layoutText):
+    def __init__(self, layoutText, frozen=True):
         self.width = len(layoutText[0])
         self.height= len(layoutText)
         self.walls = Grid(self.width, self.height, False)
@@ -36,6 +43,16 @@ class Layout:
         self.layoutText = layoutText
         self.totalFood = len(self.food.asList())
         # self.initializeVisibilityMatrix()
+        self.moveTable = None
+        if frozen:
+            self.walls.freeze()
+        self.frozen = frozen
+
+    def __setattr__(self, name, value):
+        # The visibility matrix and move table are derived from the walls, so they may be added later
+        if self.__dict__.get('frozen') and name not in ('visibility', 'moveTable'):
+            raise AttributeError('Layouts are shared between game states; change a mutableCopy() instead')
+        self.__dict__[name] = value
 
     def getNumGhosts(self):
         return self.numGhosts
@@ -61,6 +78,16 @@ class Layout:
         else:
             self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
 
+    def getMoveTable(self):
+        "The legal moves out of every cell, compiled on first use (see game.MoveTable)"
+        if not self.frozen:
+            # The walls of a mutable layout may still change, so rather than
+            # compile a table per call, answer straight from the walls
+            return MoveTable(self.walls, compiled=False)
+        if self.moveTable is None:
+            self.moveTable = MoveTable(self.walls)
+        return self.moveTable
+
     def isWall(self, pos):
         x, col = pos
         return self.walls[x][col]
@@ -90,7 +117,21 @@ class Layout:
         return "\n".join(self.layoutText)
 
     def deepCopy(self):
-        return Layout(self.layoutText[:])
+        "Layouts are immutable, so a copy can share this one"
+        if self.frozen:
+            return self
+        return self.mutableCopy()
+
+    def mutableCopy(self):
+        "A private copy of the layout, as it stands, that may be changed"
+        layout = Layout(self.layoutText[:], False)
+        layout.walls = self.walls.copy()
+        layout.food = self.food.copy()
+        layout.capsules = self.capsules[:]
+        layout.agentPositions = self.agentPositions[:]
+        layout.numGhosts = self.numGhosts
+        layout.totalFood = self.totalFood
+        return layout
 
     def processLayoutText(self, layoutText):
         """
@@ -142,8 +183,15 @@ def getLayout(name, back = 2):
         os.chdir(curdir)
     return layout
 
+def internLayout(layoutText):
+    "Returns the shared Layout for layoutText, parsing it the first time"
+    key = tuple(layoutText)
+    if key not in LAYOUT_CACHE:
+        LAYOUT_CACHE[key] = Layout(list(layoutText))
+    return LAYOUT_CACHE[key]
+
 def tryToLoad(fullname):
     if(not os.path.exists(fullname)): return None
     f = open(fullname)
-    try: return Layout([line.strip() for line in f])
+    try: return internLayout([line.strip() for line in f])
     finally: f.close()